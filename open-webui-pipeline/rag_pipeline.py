@@ -8,10 +8,142 @@ required_open_webui_version: 0.3.0
 """
 
 import requests
-from typing import List, Dict, Any, Optional, Union, Generator, Iterator
+from typing import List, Dict, Any, Optional, Tuple, Union, Generator, Iterator
 from pydantic import BaseModel, Field
+from collections import OrderedDict
+import math
 import os
 import json
+import threading
+import time
+
+
+class QueryCache:
+    """
+    In-memory cache of rendered RAG responses.
+
+    Entries are keyed on (normalized query, top_k, model_id), expire after a
+    TTL and are evicted least-recently-used once max_entries is reached.
+    When semantic lookup is enabled, a miss on the exact key falls back to the
+    entry in the same (top_k, model_id) scope whose query embedding has the
+    highest cosine similarity, provided it clears the threshold.
+    """
+
+    def __init__(self, ttl_seconds: int = 3600, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.semantic_hits = 0
+        self._entries: "OrderedDict[Tuple[str, int, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Lowercase, collapse whitespace and drop trailing punctuation"""
+        return " ".join(query.lower().split()).rstrip("?!.")
+
+    @staticmethod
+    def _cosine(a: List[float], b: List[float]) -> float:
+        dot = sum(x * y for x, y in zip(a, b))
+        norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+        return dot / norm if norm else 0.0
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry["created_at"] > self.ttl_seconds
+
+    def get(self, key: Tuple[str, int, str]) -> Optional[str]:
+        """Return the cached response for an exact key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, time.monotonic()):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["response"]
+
+    def get_similar(self, key: Tuple[str, int, str], embedding: List[float],
+                    threshold: float) -> Optional[str]:
+        """Return the response of the most similar cached query in the same scope"""
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_score = None, threshold
+            for entry_key, entry in list(self._entries.items()):
+                if self._expired(entry, now):
+                    del self._entries[entry_key]
+                    continue
+                if entry_key[1:] != key[1:] or entry["embedding"] is None:
+                    continue
+                score = self._cosine(embedding, entry["embedding"])
+                if score >= best_score:
+                    best_key, best_score = entry_key, score
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            self.semantic_hits += 1
+            return self._entries[best_key]["response"]
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def put(self, key: Tuple[str, int, str], response: str,
+            embedding: Optional[List[float]] = None):
+        """Store a response, evicting the least recently used entries if full"""
+        with self._lock:
+            self._entries[key] = {
+                "response": response,
+                "embedding": embedding,
+                "created_at": time.monotonic(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(self.max_entries, 0):
+                self._entries.popitem(last=False)
+
+    def flush(self):
+        """Drop all entries and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.semantic_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+CHARS_PER_TOKEN = 4
+
+CONTEXT_PROMPT = (
+    "Use the following retrieved documents to answer the user's question. "
+    "If they do not contain the answer, say so.\n\n{context}"
+)
+
+# Display names of the default pipeline models
+PIPELINE_NAMES = {
+    "rag-qwen-7b": "RAG + Qwen 2.5 7B",
+    "rag-qwen-coder-14b": "RAG + Qwen 2.5 Coder 14B",
+}
+
+# Request body fields forwarded to Ollama as generation options
+GENERATION_OPTIONS = {
+    "temperature": "temperature",
+    "top_p": "top_p",
+    "top_k": "top_k",
+    "min_p": "min_p",
+    "seed": "seed",
+    "stop": "stop",
+    "max_tokens": "num_predict",
+    "num_predict": "num_predict",
+    "num_ctx": "num_ctx",
+    "repeat_penalty": "repeat_penalty",
+    "frequency_penalty": "frequency_penalty",
+    "presence_penalty": "presence_penalty",
+}
 
 
 class Pipeline:
@@ -37,12 +169,60 @@ class Pipeline:
             default=30,
             description="API request timeout in seconds"
         )
+        CACHE_ENABLED: bool = Field(
+            default=True,
+            description="Cache responses for repeated queries"
+        )
+        CACHE_TTL_SECONDS: int = Field(
+            default=3600,
+            description="Seconds a cached response stays valid"
+        )
+        CACHE_MAX_ENTRIES: int = Field(
+            default=256,
+            description="Maximum cached responses before LRU eviction"
+        )
+        CACHE_FLUSH: bool = Field(
+            default=False,
+            description="Set to true to flush the cache (resets itself)"
+        )
+        CACHE_SEMANTIC: bool = Field(
+            default=False,
+            description="Match paraphrased queries by embedding similarity"
+        )
+        CACHE_SEMANTIC_THRESHOLD: float = Field(
+            default=0.95,
+            description="Minimum cosine similarity for a semantic cache hit"
+        )
+        RETRIEVAL_ONLY: bool = Field(
+            default=False,
+            description="Use /search and let the selected chat model generate"
+        )
+        OLLAMA_URL: str = Field(
+            default="http://host.docker.internal:11434",
+            description="Ollama URL used for generation in retrieval-only mode"
+        )
+        PIPELINE_MODELS: str = Field(
+            default="rag-qwen-7b=qwen2.5:7b,rag-qwen-coder-14b=qwen2.5-coder:14b",
+            description="Comma-separated pipeline-id=ollama-model pairs"
+        )
+        CONTEXT_TOKEN_BUDGET: int = Field(
+            default=2000,
+            description="Approximate token budget for packed context"
+        )
+        MAX_SOURCE_CHARS: int = Field(
+            default=1500,
+            description="Truncate each retrieved document to this many characters"
+        )
 
     def __init__(self):
         self.type = "manifold"
         self.name = "Multimodal RAG Pipeline"
         self.valves = self.Valves()
-        
+        self.cache = QueryCache(
+            ttl_seconds=self.valves.CACHE_TTL_SECONDS,
+            max_entries=self.valves.CACHE_MAX_ENTRIES
+        )
+
     async def on_startup(self):
         """Called when the pipeline starts"""
         print(f"🚀 RAG Pipeline started")
@@ -72,6 +252,198 @@ class Pipeline:
         print(f"   API URL: {self.valves.RAG_API_URL}")
         print(f"   Top K: {self.valves.TOP_K}")
 
+        self.cache.ttl_seconds = self.valves.CACHE_TTL_SECONDS
+        self.cache.max_entries = self.valves.CACHE_MAX_ENTRIES
+        print(f"   Cache Enabled: {self.valves.CACHE_ENABLED} "
+              f"(semantic: {self.valves.CACHE_SEMANTIC})")
+        print(f"   Cache: {len(self.cache)} entries, {self.cache.hits} hits "
+              f"({self.cache.semantic_hits} semantic), {self.cache.misses} misses")
+
+        if self.valves.CACHE_FLUSH:
+            self.cache.flush()
+            self.valves.CACHE_FLUSH = False
+            print("🧹 Query cache flushed")
+
+    def _embed_query(self, query: str) -> Optional[List[float]]:
+        """Embed a query through the RAG API for semantic cache lookups"""
+        try:
+            response = requests.post(
+                f"{self.valves.RAG_API_URL}/embed",
+                json={"text": query},
+                timeout=self.valves.TIMEOUT
+            )
+            if response.status_code == 200:
+                return response.json().get("embedding")
+            print(f"⚠️  Embedding for semantic cache failed: HTTP {response.status_code}")
+        except Exception as e:
+            print(f"⚠️  Embedding for semantic cache failed: {e}")
+        return None
+
+    def _format_sources(self, sources: List[dict], processing_time: int) -> str:
+        """Render the sources footer appended to responses"""
+        footer = "\n\n---\n\n### 📚 Sources\n\n"
+
+        for i, source in enumerate(sources, 1):
+            content_preview = source['content'][:150].replace('\n', ' ')
+            distance = source['distance']
+            relevance = (1 - distance) * 100
+            content_type = source['contentType'].upper()
+
+            footer += f"**{i}. [{content_type}]** (Relevance: {relevance:.1f}%)\n"
+            footer += f"   {content_preview}...\n\n"
+
+        # Add metadata info
+        footer += f"\n*Query processed in {processing_time}ms*"
+        return footer
+
+    def _pack_context(self, results: List[dict]) -> Tuple[str, List[dict]]:
+        """
+        Pack search results into a context block under the token budget.
+        Duplicate documents are dropped and long content is truncated.
+        Returns the context text and the results that made it in.
+        """
+        budget = self.valves.CONTEXT_TOKEN_BUDGET * CHARS_PER_TOKEN
+        seen = set()
+        blocks = []
+        packed = []
+        used = 0
+
+        for result in sorted(results, key=lambda r: r.get("distance", 1.0)):
+            content = " ".join((result.get("content") or "").split())
+            fingerprint = content.lower()
+            if not content or result.get("id") in seen or fingerprint in seen:
+                continue
+            seen.add(result.get("id"))
+            seen.add(fingerprint)
+
+            if len(content) > self.valves.MAX_SOURCE_CHARS:
+                content = content[:self.valves.MAX_SOURCE_CHARS].rsplit(" ", 1)[0] + "..."
+
+            header = f"[{len(blocks) + 1}] ({result.get('contentType', 'text')}) "
+            remaining = budget - used - len(header)
+            if remaining <= 0:
+                break
+            if len(content) > remaining:
+                # Only keep a partial document if a meaningful part of it fits
+                if remaining < 200:
+                    break
+                content = content[:remaining].rsplit(" ", 1)[0] + "..."
+
+            block = header + content
+            blocks.append(block)
+            packed.append(result)
+            used += len(block) + 2
+
+        return "\n\n".join(blocks), packed
+
+    @staticmethod
+    def _inject_context(messages: List[dict], context: str) -> List[dict]:
+        """Return messages with the context merged into the system message"""
+        system_content = CONTEXT_PROMPT.format(context=context)
+        messages = [dict(m) for m in messages]
+
+        if messages and messages[0].get("role") == "system":
+            messages[0]["content"] = f"{messages[0]['content']}\n\n{system_content}"
+        else:
+            messages.insert(0, {"role": "system", "content": system_content})
+
+        return messages
+
+    def _pipeline_models(self) -> Dict[str, str]:
+        """Parse the PIPELINE_MODELS valve into pipeline id -> Ollama model"""
+        models = {}
+        for pair in self.valves.PIPELINE_MODELS.split(","):
+            pipeline_id, _, ollama_model = pair.partition("=")
+            if pipeline_id.strip() and ollama_model.strip():
+                models[pipeline_id.strip()] = ollama_model.strip()
+        return models
+
+    @staticmethod
+    def _generation_options(body: dict) -> Dict[str, Any]:
+        """Collect the request's generation options in Ollama's naming"""
+        options = dict(body.get("options") or {})
+        for field, option in GENERATION_OPTIONS.items():
+            if body.get(field) is not None:
+                options[option] = body[field]
+        return options
+
+    def _generate(self, model_id: str, messages: List[dict], body: dict,
+                  footer: str = "") -> Union[str, Generator]:
+        """Generate with the Ollama model behind the selected pipeline model"""
+        pipeline_id = model_id.split(".")[-1]
+        ollama_model = self._pipeline_models().get(pipeline_id, pipeline_id)
+        stream = body.get("stream", False)
+
+        payload = {"model": ollama_model, "messages": messages, "stream": stream}
+        options = self._generation_options(body)
+        if options:
+            payload["options"] = options
+
+        response = requests.post(
+            f"{self.valves.OLLAMA_URL}/api/chat",
+            json=payload,
+            stream=stream,
+            timeout=self.valves.TIMEOUT
+        )
+        response.raise_for_status()
+
+        if not stream:
+            return response.json()["message"]["content"] + footer
+
+        def stream_response():
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                content = chunk.get("message", {}).get("content", "")
+                if content:
+                    yield content
+                if chunk.get("done"):
+                    break
+            if footer:
+                yield footer
+
+        return stream_response()
+
+    def _retrieval_pipe(
+        self, user_message: str, model_id: str, messages: List[dict], body: dict
+    ) -> Union[str, Generator]:
+        """Retrieve via /search, pack the context and let the chat model answer"""
+        footer = ""
+
+        try:
+            print("🔍 Searching RAG API...")
+            start = time.monotonic()
+            response = requests.post(
+                f"{self.valves.RAG_API_URL}/search",
+                json={
+                    "query": user_message,
+                    "topK": self.valves.TOP_K
+                },
+                timeout=self.valves.TIMEOUT
+            )
+            response.raise_for_status()
+            processing_time = int((time.monotonic() - start) * 1000)
+
+            context, sources = self._pack_context(response.json().get("results", []))
+            print(f"📚 Packed {len(sources)} sources ({len(context)} chars, {processing_time}ms)")
+
+            if context:
+                messages = self._inject_context(messages, context)
+                body["messages"] = messages
+                if self.valves.SHOW_SOURCES:
+                    footer = self._format_sources(sources, processing_time)
+
+        except Exception as e:
+            print(f"❌ RAG search failed, generating without context: {e}")
+
+        try:
+            return self._generate(model_id, messages, body, footer)
+        except Exception as e:
+            error_msg = f"Generation failed: {str(e)}"
+            print(f"💥 {error_msg}")
+            return f"⚠️ {error_msg}"
+
     def pipe(
         self, user_message: str, model_id: str, messages: List[dict], body: dict
     ) -> Union[str, Generator, Iterator]:
@@ -86,6 +458,25 @@ class Pipeline:
         if not self.valves.ENABLE_RAG:
             print("⏭️  RAG disabled, passing through to model")
             return None
+
+        if self.valves.RETRIEVAL_ONLY:
+            return self._retrieval_pipe(user_message, model_id, messages, body)
+
+        cache_key = (QueryCache.normalize(user_message), self.valves.TOP_K, model_id)
+        query_embedding = None
+
+        if self.valves.CACHE_ENABLED:
+            cached = self.cache.get(cache_key)
+            if cached is None and self.valves.CACHE_SEMANTIC:
+                query_embedding = self._embed_query(user_message)
+                if query_embedding:
+                    cached = self.cache.get_similar(
+                        cache_key, query_embedding, self.valves.CACHE_SEMANTIC_THRESHOLD
+                    )
+            if cached is not None:
+                print("⚡ Cache hit, skipping RAG API")
+                return cached
+            self.cache.record_miss()
         
         try:
             # Call your .NET RAG API
@@ -115,19 +506,10 @@ class Pipeline:
                 
                 # Add sources if enabled
                 if self.valves.SHOW_SOURCES and sources:
-                    final_response += "\n\n---\n\n### 📚 Sources\n\n"
-                    
-                    for i, source in enumerate(sources, 1):
-                        content_preview = source['content'][:150].replace('\n', ' ')
-                        distance = source['distance']
-                        relevance = (1 - distance) * 100
-                        content_type = source['contentType'].upper()
-                        
-                        final_response += f"**{i}. [{content_type}]** (Relevance: {relevance:.1f}%)\n"
-                        final_response += f"   {content_preview}...\n\n"
-                    
-                    # Add metadata info
-                    final_response += f"\n*Query processed in {processing_time}ms*"
+                    final_response += self._format_sources(sources, processing_time)
+
+                if self.valves.CACHE_ENABLED:
+                    self.cache.put(cache_key, final_response, query_embedding)
                 
                 return final_response
                 
@@ -159,12 +541,6 @@ class Pipeline:
         Each model can have different configurations.
         """
         return [
-            {
-                "id": "rag-qwen-7b",
-                "name": "RAG + Qwen 2.5 7B",
-            },
-            {
-                "id": "rag-qwen-coder-14b",
-                "name": "RAG + Qwen 2.5 Coder 14B",
-            }
+            {"id": model_id, "name": PIPELINE_NAMES.get(model_id, f"RAG + {ollama_model}")}
+            for model_id, ollama_model in self._pipeline_models().items()
         ]
\ No newline at end of file
@@ -0,0 +1 @@
+"""Ingestion benchmarks runnable without a GPU, a real Ollama or a real corpus."""
@@ -0,0 +1,112 @@
+import fitz  # pymupdf
+from PIL import Image
+from typing import Dict
+import argparse
+import io
+import os
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+WORDS = (
+    "vector index embedding retrieval document page image table query model "
+    "context search latency cluster shard replica batch stream token chunk "
+    "invoice contract report figure chart summary revenue quarter region "
+    "customer product release network storage memory processor pipeline"
+).split()
+
+
+class SyntheticCorpus:
+    """Deterministic generator of PDFs, images and text files for benchmarks"""
+
+    def __init__(self, seed: int = 42, image_size: int = 256):
+        """
+        Initialize corpus generator
+
+        Args:
+            seed: Random seed, the same seed always produces the same corpus
+            image_size: Edge length in pixels of generated images
+        """
+        self.seed = seed
+        self.image_size = image_size
+
+    def _text(self, rng: random.Random, words: int) -> str:
+        sentences = []
+        while words > 0:
+            length = min(words, rng.randint(8, 20))
+            sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+            sentences.append(sentence.capitalize() + ".")
+            words -= length
+        return " ".join(sentences)
+
+    def _image_bytes(self, rng: random.Random) -> bytes:
+        """Noisy RGB image, large enough to pass PDFProcessor's min_image_size"""
+        size = self.image_size
+        pixels = bytes(rng.getrandbits(8) for _ in range(size * size * 3))
+        buffer = io.BytesIO()
+        Image.frombytes("RGB", (size, size), pixels).save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def write_text(self, path: str, rng: random.Random, words: int = 800):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self._text(rng, words))
+
+    def write_image(self, path: str, rng: random.Random):
+        with open(path, "wb") as f:
+            f.write(self._image_bytes(rng))
+
+    def write_pdf(self, path: str, rng: random.Random, pages: int = 4,
+                  images_per_page: int = 1, words_per_page: int = 400):
+        doc = fitz.open()
+        for _ in range(pages):
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(50, 50, 550, 500), self._text(rng, words_per_page), fontsize=9)
+            for i in range(images_per_page):
+                top = 520 + i * 10
+                page.insert_image(fitz.Rect(50 + i * 10, top, 250 + i * 10, top + 200),
+                                  stream=self._image_bytes(rng))
+        doc.save(path)
+        doc.close()
+
+    def generate(self, output_dir: str, pdfs: int = 5, images: int = 5, texts: int = 10,
+                 pages_per_pdf: int = 4, images_per_page: int = 1) -> Dict[str, int]:
+        """
+        Write the corpus to output_dir
+
+        Returns counts of generated files by type
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        rng = random.Random(self.seed)
+
+        for i in range(pdfs):
+            self.write_pdf(os.path.join(output_dir, f"doc_{i:04d}.pdf"), rng,
+                           pages=pages_per_pdf, images_per_page=images_per_page)
+        for i in range(images):
+            self.write_image(os.path.join(output_dir, f"img_{i:04d}.png"), rng)
+        for i in range(texts):
+            self.write_text(os.path.join(output_dir, f"note_{i:04d}.txt"), rng)
+
+        logger.info(f"Generated corpus in {output_dir}: {pdfs} PDFs, {images} images, {texts} texts")
+        return {"pdf": pdfs, "image": images, "text": texts}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic ingestion corpus')
+    parser.add_argument('output', help='Output directory')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--pdfs', type=int, default=5)
+    parser.add_argument('--images', type=int, default=5)
+    parser.add_argument('--texts', type=int, default=10)
+    parser.add_argument('--pages', type=int, default=4, help='Pages per PDF')
+    parser.add_argument('--images-per-page', type=int, default=1)
+    args = parser.parse_args()
+
+    SyntheticCorpus(seed=args.seed).generate(
+        args.output, pdfs=args.pdfs, images=args.images, texts=args.texts,
+        pages_per_pdf=args.pages, images_per_page=args.images_per_page
+    )
+
+
+if __name__ == '__main__':
+    main()
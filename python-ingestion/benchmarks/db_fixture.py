@@ -0,0 +1,157 @@
+from typing import List, Dict, Optional
+from config import config
+import math
+import shutil
+import socket
+import subprocess
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RecordingDatabase:
+    """
+    In-memory stand-in for Database
+
+    Implements the methods ingestion calls, records every inserted row and
+    optionally sleeps per insert to emulate a database round trip.
+    """
+
+    def __init__(self, insert_latency: float = 0.0):
+        self.insert_latency = insert_latency
+        self.rows: List[Dict] = []
+
+    def setup(self):
+        pass
+
+    def embedding_model(self):
+        return None
+
+    def insert_document(self, content: str, embedding: List[float],
+                        content_type: str, metadata: Optional[Dict] = None,
+                        embedding_model: Optional[str] = None):
+        if self.insert_latency:
+            time.sleep(self.insert_latency)
+        doc_id = len(self.rows) + 1
+        self.rows.append({
+            'id': doc_id,
+            'content': content,
+            'metadata': metadata or {},
+            'content_type': content_type,
+            'embedding': list(embedding)
+        })
+        return doc_id
+
+    def search_similar(self, query_embedding: List[float],
+                       top_k: int = 5,
+                       content_type: Optional[str] = None,
+                       embedding_model: Optional[str] = None) -> List[Dict]:
+        """Exact cosine-distance search over recorded rows"""
+        query_norm = math.sqrt(sum(v * v for v in query_embedding)) or 1.0
+        results = []
+        for row in self.rows:
+            if content_type and row['content_type'] != content_type:
+                continue
+            embedding = row['embedding']
+            norm = math.sqrt(sum(v * v for v in embedding)) or 1.0
+            similarity = sum(a * b for a, b in zip(query_embedding, embedding)) / (query_norm * norm)
+            results.append({
+                'id': row['id'],
+                'content': row['content'],
+                'metadata': row['metadata'],
+                'content_type': row['content_type'],
+                'distance': 1.0 - similarity
+            })
+        results.sort(key=lambda r: r['distance'])
+        return results[:top_k]
+
+    def search_many(self, query_embeddings, top_k: int = 5, content_type: Optional[str] = None,
+                    embedding_model: Optional[str] = None):
+        """Exact counterpart of Database.search_many: (ids, distances) arrays"""
+        import numpy as np
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+        distances = np.full((len(queries), top_k), np.inf, dtype=np.float32)
+        for i, query in enumerate(queries):
+            for rank, row in enumerate(self.search_similar(query.tolist(), top_k, content_type)):
+                ids[i, rank] = row['id']
+                distances[i, rank] = row['distance']
+        return ids, distances
+
+    def close(self):
+        pass
+
+
+class PgvectorContainer:
+    """
+    Throwaway Postgres+pgvector instance in a Docker container
+
+    On enter, starts the same image docker-compose uses on a free port and
+    points config at it; on exit, removes the container and restores config.
+    """
+
+    IMAGE = "pgvector/pgvector:pg16"
+
+    def __init__(self, image: str = IMAGE, startup_timeout: float = 60.0):
+        self.image = image
+        self.startup_timeout = startup_timeout
+        self.name = f"rag-bench-{uuid.uuid4().hex[:8]}"
+        self.port = None
+        self._saved_config = None
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which("docker") is not None
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            return s.getsockname()[1]
+
+    def start(self) -> "PgvectorContainer":
+        self.port = self._free_port()
+        subprocess.run([
+            "docker", "run", "-d", "--rm", "--name", self.name,
+            "-e", f"POSTGRES_DB={config.DB_NAME}",
+            "-e", f"POSTGRES_USER={config.DB_USER}",
+            "-e", f"POSTGRES_PASSWORD={config.DB_PASSWORD}",
+            "-p", f"127.0.0.1:{self.port}:5432",
+            self.image
+        ], check=True, stdout=subprocess.DEVNULL)
+
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            ready = subprocess.run(
+                ["docker", "exec", self.name, "pg_isready", "-h", "127.0.0.1",
+                 "-U", config.DB_USER, "-d", config.DB_NAME],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            if ready.returncode == 0:
+                break
+            if time.monotonic() > deadline:
+                self.stop()
+                raise TimeoutError(f"pgvector container {self.name} did not become ready")
+            time.sleep(0.5)
+
+        self._saved_config = (config.DB_HOST, config.DB_PORT)
+        config.DB_HOST = "127.0.0.1"
+        config.DB_PORT = str(self.port)
+        logger.info(f"pgvector container {self.name} ready on port {self.port}")
+        return self
+
+    def stop(self):
+        if self._saved_config:
+            config.DB_HOST, config.DB_PORT = self._saved_config
+            self._saved_config = None
+        subprocess.run(["docker", "rm", "-f", self.name],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,208 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Optional
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FakeOllamaServer:
+    """
+    Local stand-in for the Ollama HTTP API
+
+    Emulates /api/embeddings, /api/embed and /api/chat with deterministic
+    outputs, a configurable per-call latency and a model-swap delay whenever
+    a request needs a model that is not among the currently loaded ones.
+    Setting fail_rate makes that fraction of model calls answer HTTP 500,
+    for exercising host ejection and retries.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, dimension: int = 768,
+                 embed_latency: float = 0.02, chat_latency: float = 0.5,
+                 swap_delay: float = 0.0, max_loaded_models: int = 1, fail_rate: float = 0.0):
+        """
+        Initialize fake server
+
+        Args:
+            host: Interface to bind
+            port: Port to bind, 0 picks a free port
+            dimension: Length of returned embedding vectors
+            embed_latency: Seconds per embedding input
+            chat_latency: Seconds per chat call
+            swap_delay: Seconds to "load" a model that is not resident
+            max_loaded_models: Models kept resident before evicting the least recently used
+            fail_rate: Fraction of model calls answered with HTTP 500
+        """
+        self.dimension = dimension
+        self.embed_latency = embed_latency
+        self.chat_latency = chat_latency
+        self.swap_delay = swap_delay
+        self.max_loaded_models = max_loaded_models
+        self.fail_rate = fail_rate
+        self.calls = {"embeddings": 0, "embed": 0, "chat": 0, "swaps": 0, "failures": 0}
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def embedding(self, text: str) -> List[float]:
+        """Deterministic unit vector derived from the text"""
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.dimension)]
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector]
+
+    def _use_model(self, model: Optional[str]):
+        """Simulate loading model into memory, evicting the least recently used"""
+        with self._lock:
+            if model in self._loaded:
+                self._loaded.move_to_end(model)
+                return
+            self._loaded[model] = True
+            while len(self._loaded) > self.max_loaded_models:
+                self._loaded.popitem(last=False)
+            self.calls["swaps"] += 1
+        if self.swap_delay:
+            time.sleep(self.swap_delay)
+
+    def _count(self, endpoint: str):
+        with self._lock:
+            self.calls[endpoint] += 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+            def _send(self, status: int, payload: dict):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send(200, {"models": [{"name": m} for m in server._loaded]})
+                elif self.path == "/api/version":
+                    self._send(200, {"version": "0.0.0-fake"})
+                else:
+                    self._send(404, {"error": f"unknown path {self.path}"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                model = request.get("model")
+                created_at = datetime.now(timezone.utc).isoformat()
+
+                if server.fail_rate and random.random() < server.fail_rate:
+                    server._count("failures")
+                    self._send(500, {"error": "injected failure"})
+                    return
+
+                if self.path == "/api/embeddings":
+                    server._count("embeddings")
+                    server._use_model(model)
+                    time.sleep(server.embed_latency)
+                    self._send(200, {"embedding": server.embedding(request.get("prompt", ""))})
+
+                elif self.path == "/api/embed":
+                    server._count("embed")
+                    server._use_model(model)
+                    inputs = request.get("input", [])
+                    if isinstance(inputs, str):
+                        inputs = [inputs]
+                    time.sleep(server.embed_latency * len(inputs))
+                    self._send(200, {
+                        "model": model,
+                        "embeddings": [server.embedding(text) for text in inputs]
+                    })
+
+                elif self.path == "/api/chat":
+                    server._count("chat")
+                    server._use_model(model)
+                    time.sleep(server.chat_latency)
+                    messages = request.get("messages", [])
+                    prompt = messages[-1].get("content", "") if messages else ""
+                    images = len(messages[-1].get("images") or []) if messages else 0
+                    content = (f"Synthetic description of {images} image(s) for prompt "
+                               f"'{prompt[:40]}': a chart with labelled axes and a caption.")
+                    self._send(200, {
+                        "model": model,
+                        "created_at": created_at,
+                        "message": {"role": "assistant", "content": content},
+                        "done": True,
+                        "done_reason": "stop"
+                    })
+
+                else:
+                    self._send(404, {"error": f"unknown path {self.path}"})
+
+        return Handler
+
+    def start(self) -> "FakeOllamaServer":
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Fake Ollama listening on {self.url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a fake Ollama server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--dimension', type=int, default=768)
+    parser.add_argument('--embed-latency', type=float, default=0.02, help='Seconds per embedding')
+    parser.add_argument('--chat-latency', type=float, default=0.5, help='Seconds per chat call')
+    parser.add_argument('--swap-delay', type=float, default=0.0, help='Seconds to swap models')
+    parser.add_argument('--max-loaded-models', type=int, default=1)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of calls failing with HTTP 500')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = FakeOllamaServer(
+        host=args.host, port=args.port, dimension=args.dimension,
+        embed_latency=args.embed_latency, chat_latency=args.chat_latency,
+        swap_delay=args.swap_delay, max_loaded_models=args.max_loaded_models,
+        fail_rate=args.fail_rate
+    )
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Ingestion benchmark
+
+Generates (or reuses) a corpus, serves it a fake Ollama and a recorded or
+throwaway database, runs MultimodalIngestion.ingest_directory over it and
+reports throughput and per-stage latency percentiles.
+
+Run from python-ingestion/:
+    python -m benchmarks.run_ingestion --pdfs 10 --chat-latency 0.2
+    python -m benchmarks.run_ingestion --hosts 3 --failing-hosts 1
+"""
+from collections import defaultdict
+from contextlib import ExitStack
+from typing import Dict, List
+import argparse
+import functools
+import json
+import os
+import tempfile
+import time
+import logging
+
+from config import config
+from benchmarks.corpus import SyntheticCorpus
+from benchmarks.fake_ollama import FakeOllamaServer
+from benchmarks.db_fixture import RecordingDatabase, PgvectorContainer
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linear-interpolated percentile, q in [0, 100]"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class StageRecorder:
+    """Wraps component methods to record per-call latency by stage"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def wrap(self, obj, method_name: str, stage: str):
+        method = getattr(obj, method_name)
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.samples[stage].append(time.perf_counter() - start)
+
+        setattr(obj, method_name, timed)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {
+                'count': len(values),
+                'total_s': sum(values),
+                'p50_ms': percentile(values, 50) * 1000,
+                'p95_ms': percentile(values, 95) * 1000,
+                'p99_ms': percentile(values, 99) * 1000,
+            }
+            for stage, values in sorted(self.samples.items())
+        }
+
+
+def instrument(ingestion, recorder: StageRecorder):
+    recorder.wrap(ingestion, 'ingest_pdf', 'file.pdf')
+    recorder.wrap(ingestion, 'ingest_image', 'file.image')
+    recorder.wrap(ingestion, 'ingest_text', 'file.text')
+    recorder.wrap(ingestion.pdf_processor, 'extract_pages', 'extract_pages')
+    recorder.wrap(ingestion.image_embedder, 'describe_image', 'describe_image')
+    recorder.wrap(ingestion.text_embedder, 'embed_single', 'embed_single')
+    recorder.wrap(ingestion.db, 'insert_document', 'insert_document')
+
+
+def run(corpus_dir: str, db) -> Dict:
+    """Ingest corpus_dir into db and return the benchmark report"""
+    # Imported here so config.OLLAMA_HOST is already pointing at the fake server
+    from ingestion import MultimodalIngestion
+
+    ingestion = MultimodalIngestion(db=db)
+    recorder = StageRecorder()
+    instrument(ingestion, recorder)
+
+    start = time.perf_counter()
+    try:
+        ingestion.ingest_directory(corpus_dir)
+    finally:
+        ingestion.close()
+    elapsed = time.perf_counter() - start
+
+    stages = recorder.summary()
+    files = sum(s['count'] for name, s in stages.items() if name.startswith('file.'))
+    chunks = stages.get('insert_document', {}).get('count', 0)
+
+    return {
+        'elapsed_s': elapsed,
+        'files': files,
+        'chunks': chunks,
+        'files_per_s': files / elapsed if elapsed else 0.0,
+        'chunks_per_s': chunks / elapsed if elapsed else 0.0,
+        'stages': stages,
+    }
+
+
+def print_report(report: Dict, ollama_calls: Dict[str, int]):
+    print(f"\nIngested {report['files']} files / {report['chunks']} chunks "
+          f"in {report['elapsed_s']:.2f}s")
+    print(f"Throughput: {report['files_per_s']:.2f} files/s, {report['chunks_per_s']:.2f} chunks/s")
+    print(f"Ollama calls: {ollama_calls}\n")
+    print(f"{'stage':<18}{'count':>8}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, s in report['stages'].items():
+        print(f"{stage:<18}{s['count']:>8}{s['total_s']:>10.2f}"
+              f"{s['p50_ms']:>10.1f}{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}")
+    if report.get('hosts'):
+        from embedders.host_pool import format_stats
+        print()
+        print(format_stats(report['hosts']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark multimodal ingestion')
+    parser.add_argument('--corpus', help='Existing corpus directory (default: generate one)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--pdfs', type=int, default=5)
+    parser.add_argument('--images', type=int, default=5)
+    parser.add_argument('--texts', type=int, default=10)
+    parser.add_argument('--pages', type=int, default=4, help='Pages per generated PDF')
+    parser.add_argument('--embed-latency', type=float, default=0.02, help='Fake Ollama seconds per embedding')
+    parser.add_argument('--chat-latency', type=float, default=0.5, help='Fake Ollama seconds per vision call')
+    parser.add_argument('--swap-delay', type=float, default=0.0, help='Fake Ollama model swap seconds')
+    parser.add_argument('--max-loaded-models', type=int, default=1)
+    parser.add_argument('--hosts', type=int, default=1, help='Number of fake Ollama hosts to balance over')
+    parser.add_argument('--failing-hosts', type=int, default=0,
+                        help='How many of the hosts answer every call with HTTP 500')
+    parser.add_argument('--db', choices=['fake', 'docker'], default='fake',
+                        help='Recorded in-memory database or a throwaway pgvector container')
+    parser.add_argument('--insert-latency', type=float, default=0.0, help='Fake database seconds per insert')
+    parser.add_argument('--json', help='Also write the report as JSON to this path')
+    args = parser.parse_args()
+
+    # Configure before ingestion's own basicConfig, which is then a no-op
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    with tempfile.TemporaryDirectory(prefix='rag-bench-') as tmp:
+        corpus_dir = args.corpus
+        if not corpus_dir:
+            corpus_dir = os.path.join(tmp, 'corpus')
+            SyntheticCorpus(seed=args.seed).generate(
+                corpus_dir, pdfs=args.pdfs, images=args.images,
+                texts=args.texts, pages_per_pdf=args.pages
+            )
+
+        with ExitStack() as stack:
+            servers = [
+                stack.enter_context(FakeOllamaServer(
+                    dimension=config.VECTOR_DIMENSION,
+                    embed_latency=args.embed_latency,
+                    chat_latency=args.chat_latency,
+                    swap_delay=args.swap_delay,
+                    max_loaded_models=args.max_loaded_models,
+                    fail_rate=1.0 if i < args.failing_hosts else 0.0
+                ))
+                for i in range(args.hosts)
+            ]
+            config.OLLAMA_HOST = servers[0].url
+            config.OLLAMA_HOSTS = ','.join(server.url for server in servers)
+
+            if args.db == 'docker':
+                from database import Database
+                with PgvectorContainer():
+                    setup_db = Database(register_vector_type=False)
+                    setup_db.setup()
+                    setup_db.close()
+                    report = run(corpus_dir, Database())
+            else:
+                report = run(corpus_dir, RecordingDatabase(insert_latency=args.insert_latency))
+
+            report['ollama_calls'] = {
+                name: sum(server.calls[name] for server in servers) for name in servers[0].calls
+            }
+            from embedders.host_pool import pool_stats
+            report['hosts'] = pool_stats()
+
+    print_report(report, report['ollama_calls'])
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+CLI startup benchmark
+
+Measures, each in a fresh interpreter, the time to import main, to run
+`main.py --help`, and from interpreter start to the first document insert
+for a one-line text file (against the fake Ollama and the in-memory
+database, so only fixed client-side cost is measured).
+
+Run from python-ingestion/:
+    python -m benchmarks.startup --runs 10
+"""
+from typing import Dict, List
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.fake_ollama import FakeOllamaServer
+
+INGESTION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_MAIN = """
+import time
+start = time.perf_counter()
+import main
+print(time.perf_counter() - start)
+"""
+
+FIRST_INSERT = """
+import time
+start = time.perf_counter()
+from ingestion import MultimodalIngestion
+from benchmarks.db_fixture import RecordingDatabase
+
+db = RecordingDatabase()
+first_insert = []
+insert_document = db.insert_document
+
+def timed_insert(*args, **kwargs):
+    if not first_insert:
+        first_insert.append(time.perf_counter() - start)
+    return insert_document(*args, **kwargs)
+
+db.insert_document = timed_insert
+MultimodalIngestion(db=db).ingest_text("startup benchmark", {'source': 'startup'})
+print(first_insert[0])
+"""
+
+
+def _python(code: str, env: Dict[str, str]) -> float:
+    """Run code in a fresh interpreter and return the float it prints"""
+    result = subprocess.run([sys.executable, "-c", code], cwd=INGESTION_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def _wall(args: List[str], env: Dict[str, str]) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=INGESTION_DIR, env=env,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        'median_ms': statistics.median(samples) * 1000,
+        'min_ms': min(samples) * 1000,
+        'max_ms': max(samples) * 1000,
+    }
+
+
+def run(runs: int = 5) -> Dict[str, Dict[str, float]]:
+    env = dict(os.environ)
+    results = {
+        'import main': summarize([_python(IMPORT_MAIN, env) for _ in range(runs)]),
+        'main.py --help (wall)': summarize([_wall(["main.py", "--help"], env) for _ in range(runs)]),
+    }
+
+    with FakeOllamaServer(embed_latency=0.0, chat_latency=0.0) as server:
+        env["OLLAMA_HOST"] = server.url
+        results['time to first insert'] = summarize([_python(FIRST_INSERT, env) for _ in range(runs)])
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ingestion CLI startup')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per measurement')
+    parser.add_argument('--importtime', action='store_true',
+                        help='Also print the 15 slowest imports of ingestion (python -X importtime)')
+    args = parser.parse_args()
+
+    print(f"{'measurement':<26}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for name, s in run(args.runs).items():
+        print(f"{name:<26}{s['median_ms']:>12.1f}{s['min_ms']:>10.1f}{s['max_ms']:>10.1f}")
+
+    if args.importtime:
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import ingestion"],
+                                cwd=INGESTION_DIR, capture_output=True, text=True)
+        rows = []
+        for line in result.stderr.splitlines()[1:]:
+            parts = line.split("|")
+            if len(parts) == 3 and parts[1].strip().isdigit():
+                rows.append((int(parts[1]), parts[2].rstrip()))
+        print("\nSlowest imports (cumulative us):")
+        for cumulative, module in sorted(rows, reverse=True)[:15]:
+            print(f"{cumulative:>12}  {module}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,86 @@
 import os
-from dotenv import load_dotenv
 
-load_dotenv()
+_env_loaded = False
+
+
+def _load_env():
+    """Load .env once, on first settings access rather than at import"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+class Setting:
+    """Environment variable resolved on first access and cached on the instance"""
+
+    def __init__(self, default: str, cast=str):
+        self.default = default
+        self.cast = cast
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        _load_env()
+        value = self.cast(os.getenv(self.name, self.default))
+        # Non-data descriptor: the instance attribute shadows it from now on,
+        # and assigning config.X still overrides as before
+        instance.__dict__[self.name] = value
+        return value
+
+
+def _flag(value: str) -> bool:
+    return value.lower() == "true"
+
 
 class Config:
     # Database
-    DB_HOST = os.getenv("DB_HOST", "localhost")
-    DB_PORT = os.getenv("DB_PORT", "5432")
-    DB_NAME = os.getenv("DB_NAME", "multimodal_rag")
-    DB_USER = os.getenv("DB_USER", "raguser")
-    DB_PASSWORD = os.getenv("DB_PASSWORD", "ragpassword")
+    DB_HOST = Setting("localhost")
+    DB_PORT = Setting("5432")
+    DB_NAME = Setting("multimodal_rag")
+    DB_USER = Setting("raguser")
+    DB_PASSWORD = Setting("ragpassword")
+    DB_POOL_MIN = Setting("1", int)
+    DB_POOL_MAX = Setting("10", int)
 
     # Ollama
-    OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
-    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
-    VISION_MODEL = os.getenv("VISION_MODEL", "qwen2.5-vl:7b")
-    TEXT_MODEL = os.getenv("TEXT_MODEL", "qwen2.5:14b")
+    OLLAMA_HOST = Setting("http://localhost:11434")
+    EMBEDDING_MODEL = Setting("nomic-embed-text")
+    VISION_MODEL = Setting("qwen2.5-vl:7b")
+    TEXT_MODEL = Setting("qwen2.5:14b")
+
+    # Ollama host pools: comma-separated "url[=weight]" lists; empty falls
+    # back to OLLAMA_HOST, and vision calls fall back to OLLAMA_HOSTS
+    OLLAMA_HOSTS = Setting("")
+    OLLAMA_VISION_HOSTS = Setting("")
+    OLLAMA_BALANCING = Setting("least-outstanding")
+    OLLAMA_MAX_CONCURRENCY_PER_HOST = Setting("4", int)
+    OLLAMA_HEALTH_INTERVAL = Setting("30", float)
 
     # Vector
-    VECTOR_DIMENSION = int(os.getenv("VECTOR_DIMENSION", "768"))
+    VECTOR_DIMENSION = Setting("768", int)
+
+    # Vector index (see `main.py eval-index` for choosing these); a search
+    # setting of 0 leaves the server default
+    VECTOR_INDEX = Setting("ivfflat")
+    IVFFLAT_LISTS = Setting("100", int)
+    IVFFLAT_PROBES = Setting("0", int)
+    HNSW_M = Setting("16", int)
+    HNSW_EF_CONSTRUCTION = Setting("64", int)
+    HNSW_EF_SEARCH = Setting("0", int)
+
+    # Reduced-dimension search: candidates from a REDUCED_DIMENSION column
+    # (0 disables; built by `main.py reduce`), re-ranked with full vectors
+    REDUCED_DIMENSION = Setting("0", int)
+    REDUCTION = Setting("matryoshka")
+    RERANK_OVERSAMPLE = Setting("4", int)
+
+    # Metrics
+    METRICS_ENABLED = Setting("false", _flag)
 
     @property
     def db_config(self):
@@ -31,4 +93,4 @@ class Config:
         }
 
 
-config = Config()
\ No newline at end of file
+config = Config()
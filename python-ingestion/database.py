@@ -1,31 +1,227 @@
 import psycopg2
 from psycopg2.extras import Json, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from pgvector.psycopg2 import register_vector
-from typing import List, Dict, Optional
+from contextlib import contextmanager
+from typing import Iterator, List, Dict, Optional, Tuple, TYPE_CHECKING
 from config import config
+from metrics import metrics
+import io
+import struct
+import threading
 import logging
 
+if TYPE_CHECKING:
+    import numpy as np
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Postgres binary timestamps count microseconds from 2000-01-01
+PG_EPOCH_OFFSET_US = 946684800 * 1000000
+
+COPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+COPY_TRAILER = struct.pack('>h', -1)
+
+
+def vector_literal(embedding) -> str:
+    """pgvector text form of an embedding, so it binds as a single parameter"""
+    return '[' + ','.join(map(str, embedding.tolist() if hasattr(embedding, 'tolist') else embedding)) + ']'
+
+
+def parse_vector(text: str) -> 'np.ndarray':
+    """float32 array from pgvector's text form, much faster than per-row type adaptation"""
+    import numpy as np
+    return np.fromstring(text[1:-1], sep=',', dtype=np.float32)
+
+
+def vector_index_sql(table: str, column: str, method: Optional[str] = None,
+                     options: Optional[Dict[str, int]] = None, concurrently: bool = False) -> str:
+    """
+    CREATE INDEX statement for a cosine-distance vector index
+
+    Args:
+        table: Table to index
+        column: Vector column
+        method: 'ivfflat' or 'hnsw' (default VECTOR_INDEX)
+        options: Index storage parameters (default from IVFFLAT_LISTS / HNSW_*)
+        concurrently: Build without blocking writes
+    """
+    method = method or config.VECTOR_INDEX
+    if options is None:
+        options = ({'m': config.HNSW_M, 'ef_construction': config.HNSW_EF_CONSTRUCTION}
+                   if method == 'hnsw' else {'lists': config.IVFFLAT_LISTS})
+    with_clause = ', '.join(f"{name} = {int(value)}" for name, value in options.items())
+    return f"""
+        CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {table}_{column}_idx 
+        ON {table} USING {method} ({column} vector_cosine_ops) 
+        WITH ({with_clause});
+    """
+
+
+MIGRATIONS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS embedding_migrations (
+        id SERIAL PRIMARY KEY,
+        model TEXT NOT NULL,
+        dimension INTEGER NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        last_id BIGINT NOT NULL DEFAULT 0,
+        rows_done BIGINT NOT NULL DEFAULT 0,
+        started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP
+    );
+"""
+
+# Model of the vectors in documents.embedding, recorded by the last reembed swap
+ACTIVE_MODEL_SQL = """
+    SELECT model, dimension FROM embedding_migrations
+    WHERE status = 'swapped'
+    ORDER BY id DESC
+    LIMIT 1
+"""
+
+
+REDUCED_COLUMN = 'embedding_reduced'
+
+# Dimension and comment (how it was built) of documents.embedding_reduced
+REDUCED_STATE_SQL = f"""
+    SELECT a.atttypmod, col_description(a.attrelid, a.attnum) FROM pg_attribute a
+    WHERE a.attrelid = to_regclass('documents') AND a.attname = '{REDUCED_COLUMN}' AND NOT a.attisdropped
+"""
+
+
+def model_key(model: str) -> str:
+    """Model name with Ollama's implicit ':latest' tag removed, for comparisons"""
+    return model[:-len(':latest')] if model.endswith(':latest') else model
+
+
+class EmbeddingModelMismatch(RuntimeError):
+    """Vectors from one model used against a column holding another model's embeddings"""
+
+    def __init__(self, model: str, active_model: str, dimension: int):
+        super().__init__(f"documents.embedding holds {active_model} ({dimension} dimensions) "
+                         f"since a reembed swap, not {model}")
+        self.model = model
+        self.active_model = active_model
+        self.dimension = dimension
+
+
+def search_settings() -> Dict[str, int]:
+    """Index search parameters to set on every connection"""
+    settings = {}
+    if config.IVFFLAT_PROBES:
+        settings['ivfflat.probes'] = config.IVFFLAT_PROBES
+    if config.HNSW_EF_SEARCH:
+        settings['hnsw.ef_search'] = config.HNSW_EF_SEARCH
+    return settings
+
+
+class _VectorConnectionPool(ThreadedConnectionPool):
+    """Thread-safe pool that registers the vector type on new connections"""
+
+    def __init__(self, minconn: int, maxconn: int, register_vector_type: bool, **kwargs):
+        self.register_vector_type = register_vector_type
+        super().__init__(minconn, maxconn, **kwargs)
+
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        if self.register_vector_type:
+            register_vector(conn)
+        return conn
+
+
 class Database:
-    def __init__(self, register_vector_type=True):
+    """
+    Connection pool over the documents table
+
+    `conn` is a connection held for the owner's multi-statement work (setup,
+    migrations, bulk load). insert_document, search_similar, search_many and
+    delete_by_source borrow a pooled connection per call, so one Database
+    can be shared across threads.
+
+    After a reembed swap the embedding column holds another model's vectors.
+    Writers and searchers that pass embedding_model are refused with
+    EmbeddingModelMismatch if it is not the model recorded by the swap.
+
+    Once `main.py reduce` has built documents.embedding_reduced, every insert
+    also writes the reduced vector; each insert checks the column is still
+    built the way this process last saw it, and reloads the reducer if not.
+    With REDUCED_DIMENSION set to match, searches take top_k *
+    RERANK_OVERSAMPLE candidates from the reduced column's index, plus any
+    rows still lacking a reduced vector, and re-score them with the full
+    vectors.
+    """
+
+    def __init__(self, register_vector_type=True, min_connections: Optional[int] = None,
+                 max_connections: Optional[int] = None):
+        """
+        Initialize database
+
+        Args:
+            register_vector_type: Register pgvector's type on connections
+            min_connections: Connections opened up front (default DB_POOL_MIN)
+            max_connections: Upper bound on open connections (default DB_POOL_MAX)
+        """
         self.conn = None
+        self.pool = None
         self.register_vector_type = register_vector_type
+        self.min_connections = min_connections or config.DB_POOL_MIN
+        self.max_connections = max(max_connections or config.DB_POOL_MAX, self.min_connections, 2)
         self.connect()
+        self._ensure_migrations_table()
+
+        self.reducer = None
+        self._reduced_state = None
+        self.load_reducer()
+        if config.REDUCED_DIMENSION and self.search_reducer is None:
+            logger.warning(f"REDUCED_DIMENSION={config.REDUCED_DIMENSION} REDUCTION={config.REDUCTION} "
+                           f"but documents.{REDUCED_COLUMN} is not built that way; searching full vectors "
+                           f"(run `main.py reduce`)")
 
     def connect(self):
-        """Establish database connection"""
+        """Open the connection pool and take the owner's connection from it"""
         try:
-            self.conn = psycopg2.connect(**config.db_config)
-            if self.register_vector_type:
-                register_vector(self.conn)
-            logger.info("Database connection established")
+            connect_kwargs = dict(config.db_config)
+            settings = search_settings()
+            if settings:
+                connect_kwargs['options'] = ' '.join(f"-c {name}={value}" for name, value in settings.items())
+            self.pool = _VectorConnectionPool(
+                self.min_connections, self.max_connections,
+                self.register_vector_type, **connect_kwargs
+            )
+            # getconn() raises rather than waits when the pool is exhausted
+            self._slots = threading.BoundedSemaphore(self.max_connections)
+            self._slots.acquire()
+            self.conn = self.pool.getconn()
+            logger.info(f"Database connection pool established "
+                        f"({self.min_connections}-{self.max_connections} connections)")
         except psycopg2.Error as e:
             logger.error(f"Failed to connect to database: {e}")
             raise
 
-    def setup(self):
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection, committing on success and rolling back on error"""
+        self._slots.acquire()
+        conn = None
+        try:
+            conn = self.pool.getconn()
+            if conn.closed:
+                self.pool.putconn(conn, close=True)
+                conn = self.pool.getconn()
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+        finally:
+            if conn is not None:
+                self.pool.putconn(conn, close=bool(conn.closed))
+            self._slots.release()
+
+    def setup(self, with_vector_index: bool = True):
         """Create tables and indexes"""
         with self.conn.cursor() as cur:
             # Enable pgvector extension
@@ -47,11 +243,8 @@ class Database:
             """)
 
             # Create index for vector similarity search
-            cur.execute("""
-                CREATE INDEX IF NOT EXISTS documents_embedding_idx 
-                ON documents USING ivfflat (embedding vector_cosine_ops) 
-                WITH (lists = 100);
-            """)
+            if with_vector_index:
+                self._create_vector_index(cur)
 
             # Create index on content_type for filtering
             cur.execute("""
@@ -59,63 +252,442 @@ class Database:
                 ON documents (content_type);            
             """)
 
+            # Create index on source file for re-ingestion and deletes
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS documents_source_idx
+                ON documents ((metadata->>'source'));
+            """)
+
+            cur.execute(MIGRATIONS_TABLE_SQL)
+
             self.conn.commit()
             logger.info("Database setup complete")
 
-    def insert_document(self, content: str, embedding: List[float],
-                        content_type: str, metadata: Optional[Dict] = None):
-        """Insert a single document"""
-        with self.conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO documents (content, metadata, content_type, embedding) 
-                VALUES (%s, %s, %s, %s)
-                    RETURNING id
-            """, (content, Json(metadata or {}), content_type, embedding))
+    @staticmethod
+    def _create_vector_index(cur, column: str = 'embedding', concurrently: bool = False):
+        cur.execute(vector_index_sql('documents', column, concurrently=concurrently))
 
-            doc_id = cur.fetchone()[0]
+    def create_vector_index(self):
+        """(Re)build the vector similarity index and refresh planner statistics"""
+        with self.conn.cursor() as cur:
+            self._create_vector_index(cur)
+            cur.execute("ANALYZE documents;")
             self.conn.commit()
-            return doc_id
+            logger.info("Vector index built")
 
-    def search_similar(self, query_embedding: List[float],
-                       top_k: int = 5,
-                       content_type: Optional[str] = None) -> List[Dict]:
-        """Search for similar documents"""
+    def drop_vector_index(self):
+        """Drop the vector index, e.g. before a bulk load"""
         with self.conn.cursor() as cur:
-            if content_type:
+            cur.execute("DROP INDEX IF EXISTS documents_embedding_idx;")
+            self.conn.commit()
+
+    def iter_documents(self, batch_size: int = 10000) -> Iterator[List[tuple]]:
+        """
+        Stream all documents with an embedding through a server-side cursor
+
+        Yields lists of (content, metadata_json, content_type, embedding,
+        created_at) rows, with metadata left as JSON text.
+        """
+        try:
+            with self.conn.cursor(name='iter_documents') as cur:
+                cur.itersize = batch_size
                 cur.execute("""
-                    SELECT id, content, metadata, content_type,
-                           embedding <=> %s as distance
+                    SELECT content, metadata::text, content_type, embedding, created_at
                     FROM documents
-                    WHERE content_type = %s
-                    ORDER BY embedding <=> %s
-                    LIMIT %s
-                """, (query_embedding, content_type, query_embedding, top_k))
+                    WHERE embedding IS NOT NULL
+                    ORDER BY id
+                """)
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+        finally:
+            self.conn.rollback()
+
+    def copy_documents(self, contents: List[Optional[str]], metadata_json: List[Optional[str]],
+                       content_types: List[Optional[str]], embeddings,
+                       created_at_us: List[Optional[int]]) -> int:
+        """
+        Bulk load documents with binary COPY, without committing
+
+        Args:
+            contents: Document texts
+            metadata_json: Metadata as JSON text
+            content_types: Content type per row
+            embeddings: float32 array of shape (rows, VECTOR_DIMENSION)
+            created_at_us: Creation times as microseconds since the Unix epoch
+        """
+        rows, dim = embeddings.shape
+        vectors = embeddings.astype('>f4', copy=False)
+        vector_prefix = struct.pack('>iHH', 4 + 4 * dim, dim, 0)
+        null = struct.pack('>i', -1)
+        pack_len = struct.Struct('>i').pack
+        pack_timestamp = struct.Struct('>iq').pack
+
+        buffer = io.BytesIO()
+        buffer.write(COPY_HEADER)
+        for i in range(rows):
+            buffer.write(b'\x00\x05')
+            for value in (contents[i], content_types[i]):
+                if value is None:
+                    buffer.write(null)
+                else:
+                    data = value.encode('utf-8')
+                    buffer.write(pack_len(len(data)))
+                    buffer.write(data)
+            if metadata_json[i] is None:
+                buffer.write(null)
             else:
-                cur.execute("""
-                            SELECT id,
-                                   content,
-                                   metadata,
-                                   content_type,
-                                   embedding <=> %s as distance
-                            FROM documents
-                            ORDER BY embedding <=> %s
-                            LIMIT %s
-                            """, (query_embedding, query_embedding, top_k))
-
-            results = []
-            for row in cur.fetchall():
-                results.append({
-                    'id': row[0],
-                    'content': row[1],
-                    'metadata': row[2],
-                    'content_type': row[3],
-                    'distance': float(row[4])
-                })
-
-            return results
+                # jsonb binary format is a version byte followed by the JSON text
+                data = metadata_json[i].encode('utf-8')
+                buffer.write(pack_len(len(data) + 1))
+                buffer.write(b'\x01')
+                buffer.write(data)
+            buffer.write(vector_prefix)
+            buffer.write(vectors[i].tobytes())
+            if created_at_us[i] is None:
+                buffer.write(null)
+            else:
+                buffer.write(pack_timestamp(8, created_at_us[i] - PG_EPOCH_OFFSET_US))
+        buffer.write(COPY_TRAILER)
+        buffer.seek(0)
+
+        with self.conn.cursor() as cur:
+            cur.copy_expert(
+                "COPY documents (content, content_type, metadata, embedding, created_at) "
+                "FROM STDIN WITH (FORMAT binary)",
+                buffer
+            )
+        return rows
+
+    def _ensure_migrations_table(self):
+        """Model checks read embedding_migrations, so it must exist before any swap"""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('embedding_migrations') IS NOT NULL")
+            if not cur.fetchone()[0]:
+                cur.execute(MIGRATIONS_TABLE_SQL)
+        self.conn.commit()
+
+    def reduced_column_state(self) -> Optional[Tuple[int, Optional[str]]]:
+        """(dimension, comment) of documents.embedding_reduced, None if it does not exist"""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute(REDUCED_STATE_SQL)
+            return cur.fetchone()
+
+    def load_reducer(self) -> bool:
+        """(Re)load the reducer the reduced column was built with, True if the column changed"""
+        state = self.reduced_column_state()
+        if state == self._reduced_state and (state is None or self.reducer is not None):
+            return False
+        reducer = None
+        if state is not None:
+            from reduction import load_reducer
+            reducer = load_reducer(self, state)
+        self.reducer, self._reduced_state = reducer, state
+        return True
+
+    @property
+    def search_reducer(self):
+        """The reducer, when REDUCED_DIMENSION / REDUCTION ask for reduced candidate search"""
+        reducer = self.reducer
+        if (reducer is None or reducer.dimension != config.REDUCED_DIMENSION
+                or reducer.method != config.REDUCTION):
+            return None
+        return reducer
+
+    def embedding_dimension(self) -> Optional[int]:
+        """Dimension of documents.embedding, None if the table does not exist yet"""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT a.atttypmod FROM pg_attribute a
+                WHERE a.attrelid = to_regclass('documents') AND a.attname = 'embedding' AND NOT a.attisdropped
+            """)
+            row = cur.fetchone()
+            return row[0] if row else None
+
+    def embedding_model(self) -> Optional[Tuple[str, int]]:
+        """(model, dimension) recorded by the last reembed swap, None if there was none"""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute(ACTIVE_MODEL_SQL)
+            return cur.fetchone()
+
+    @staticmethod
+    def _check_model(cur, embedding_model: Optional[str]):
+        """Raise EmbeddingModelMismatch if embedding_model is not the stored vectors' model"""
+        if not embedding_model:
+            return
+        cur.execute(ACTIVE_MODEL_SQL)
+        row = cur.fetchone()
+        if row and model_key(row[0]) != model_key(embedding_model):
+            raise EmbeddingModelMismatch(embedding_model, *row)
+
+    def insert_document(self, content: str, embedding: List[float],
+                        content_type: str, metadata: Optional[Dict] = None,
+                        embedding_model: Optional[str] = None):
+        """
+        Insert a single document
+
+        Args:
+            content: Document text
+            embedding: Its embedding
+            content_type: 'text', 'image' or 'pdf'
+            metadata: JSON-serializable metadata
+            embedding_model: Model that produced embedding; if given, the insert
+                is refused when a reembed swap has switched to another model
+        """
+        metrics.count('rows_inserted')
+        for attempt in range(2):
+            try:
+                doc_id = self._insert(content, embedding, content_type, metadata, embedding_model)
+            except psycopg2.errors.UndefinedColumn:
+                # The reduced column was dropped since the reducer was loaded
+                if self._reduced_state is None:
+                    raise
+                doc_id = None
+            if doc_id is not None:
+                return doc_id
+            if not attempt and self.load_reducer():
+                continue
+            break
+
+        active = self.embedding_model()
+        if embedding_model and active and model_key(active[0]) != model_key(embedding_model):
+            raise EmbeddingModelMismatch(embedding_model, *active)
+        raise RuntimeError(f"Insert refused: documents.{REDUCED_COLUMN} changed while inserting")
+
+    def _insert(self, content: str, embedding: List[float], content_type: str,
+                metadata: Optional[Dict], embedding_model: Optional[str]) -> Optional[int]:
+        """
+        One guarded INSERT, returning None if a guard refused it
+
+        The guards run in the INSERT itself. A reembed swap or reduce rebuild
+        holds a lock on documents until it commits, so no insert can land
+        between such a change and its check.
+        """
+        state, reducer = self._reduced_state, self.reducer
+        columns = ['content', 'metadata', 'content_type', 'embedding']
+        values = ['%s', '%s::jsonb', '%s', '%s::vector']
+        params = [content, Json(metadata or {}), content_type, vector_literal(embedding)]
+        if reducer:
+            columns.append(REDUCED_COLUMN)
+            values.append('%s::vector')
+            params.append(vector_literal(reducer.reduce(embedding)[0]))
+
+        if state is None:
+            guards = [f"NOT EXISTS ({REDUCED_STATE_SQL})"]
+        else:
+            guards = [f"EXISTS (SELECT 1 FROM ({REDUCED_STATE_SQL}) r(dimension, tag) "
+                      f"WHERE dimension = %s AND tag IS NOT DISTINCT FROM %s)"]
+            params.extend(state)
+        if embedding_model:
+            guards.append(f"""NOT EXISTS (
+                SELECT 1 FROM ({ACTIVE_MODEL_SQL}) active
+                WHERE regexp_replace(model, ':latest$', '') <> %s
+            )""")
+            params.append(model_key(embedding_model))
+
+        with metrics.timer('insert_document', content_type), self.connection() as conn, conn.cursor() as cur:
+            cur.execute(f"""
+                INSERT INTO documents ({', '.join(columns)})
+                SELECT {', '.join(values)}
+                WHERE {' AND '.join(guards)}
+                RETURNING id
+            """, params)
+            row = cur.fetchone()
+            return row[0] if row else None
+
+    def search_similar(self, query_embedding: List[float],
+                       top_k: int = 5,
+                       content_type: Optional[str] = None,
+                       embedding_model: Optional[str] = None) -> List[Dict]:
+        """Search for similar documents, checking embedding_model if given"""
+        for attempt in range(2):
+            reducer = self.search_reducer
+            where = 'WHERE content_type = %s' if content_type else ''
+            filters = [content_type] if content_type else []
+            if reducer:
+                # Candidates from the reduced index, re-ranked by full-vector distance
+                source = f"""(
+                    {self._reduced_candidates('content, metadata, content_type, embedding',
+                                              '%s::vector', content_type)}
+                ) AS candidates"""
+                params = (vector_literal(query_embedding), *filters,
+                          vector_literal(reducer.reduce(query_embedding)[0]),
+                          top_k * config.RERANK_OVERSAMPLE, *filters, top_k)
+                where = ''
+            else:
+                source = 'documents'
+                params = (vector_literal(query_embedding), *filters, top_k)
+
+            try:
+                with metrics.timer('search_similar'), self.connection() as conn, conn.cursor() as cur:
+                    self._check_model(cur, embedding_model)
+                    # The vector is bound once; ordering by the output column still uses the index
+                    cur.execute(f"""
+                        SELECT id, content, metadata, content_type,
+                               embedding <=> %s::vector AS distance
+                        FROM {source}
+                        {where}
+                        ORDER BY distance
+                        LIMIT %s
+                    """, params)
+
+                    columns = ('id', 'content', 'metadata', 'content_type', 'distance')
+                    return [dict(zip(columns, row)) for row in cur.fetchall()]
+            except psycopg2.errors.UndefinedColumn:
+                # The reduced column was dropped since the reducer was loaded
+                if reducer is None or attempt:
+                    raise
+                self.load_reducer()
+
+    @staticmethod
+    def _reduced_candidates(columns: str, reduced_query: str, content_type: Optional[str]) -> str:
+        """
+        Candidate rows for a reduced-dimension search
+
+        The nearest rows by reduced vector (bound as reduced_query, then the
+        candidate count), plus rows that have no reduced vector yet and so
+        are not in the reduced index. content_type, if given, is bound
+        before each part.
+        """
+        content_filter = ' AND content_type = %s' if content_type else ''
+        return f"""
+            (SELECT id, {columns} FROM documents
+             WHERE {REDUCED_COLUMN} IS NOT NULL{content_filter}
+             ORDER BY {REDUCED_COLUMN} <=> {reduced_query}
+             LIMIT %s)
+            UNION ALL
+            SELECT id, {columns} FROM documents
+            WHERE {REDUCED_COLUMN} IS NULL{content_filter}
+        """
+
+    def search_many(self, query_embeddings, top_k: int = 5,
+                    content_type: Optional[str] = None,
+                    embedding_model: Optional[str] = None) -> Tuple['np.ndarray', 'np.ndarray']:
+        """
+        Run many similarity searches in one round trip
+
+        The queries are sent as a single vector[] and searched with a LATERAL
+        join, so each one still uses the vector index.
+
+        Args:
+            query_embeddings: Array-like of shape (queries, VECTOR_DIMENSION)
+            top_k: Results per query
+            content_type: Optional content type filter
+            embedding_model: Model of the queries, checked against the stored vectors
+
+        Returns:
+            (ids, distances) arrays of shape (queries, top_k), int64 and
+            float32, padded with -1 / inf where fewer than top_k rows match
+        """
+        import numpy as np
+
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+        distances = np.full((len(queries), top_k), np.inf, dtype=np.float32)
+        if not len(queries):
+            return ids, distances
+
+        literals = [vector_literal(q) for q in queries]
+        for attempt in range(2):
+            reducer = self.search_reducer
+            where = 'WHERE content_type = %s' if content_type else ''
+            filters = [content_type] if content_type else []
+            if reducer:
+                reduced = [vector_literal(q) for q in reducer.reduce(queries)]
+                sql = f"""
+                    SELECT q.idx - 1, d.id, d.distance
+                    FROM unnest(%s::vector[], %s::vector[]) WITH ORDINALITY AS q(embedding, reduced, idx)
+                    CROSS JOIN LATERAL (
+                        SELECT id, c.embedding <=> q.embedding AS distance
+                        FROM ({self._reduced_candidates('embedding', 'q.reduced', content_type)}) c
+                        ORDER BY distance
+                        LIMIT %s
+                    ) d
+                    ORDER BY q.idx, d.distance
+                """
+                params = (literals, reduced, *filters, top_k * config.RERANK_OVERSAMPLE, *filters, top_k)
+            else:
+                sql = f"""
+                    SELECT q.idx - 1, d.id, d.distance
+                    FROM unnest(%s::vector[]) WITH ORDINALITY AS q(embedding, idx)
+                    CROSS JOIN LATERAL (
+                        SELECT id, embedding <=> q.embedding AS distance
+                        FROM documents
+                        {where}
+                        ORDER BY distance
+                        LIMIT %s
+                    ) d
+                    ORDER BY q.idx, d.distance
+                """
+                params = (literals, *filters, top_k)
+
+            try:
+                with metrics.timer('search_many'), self.connection() as conn, conn.cursor() as cur:
+                    self._check_model(cur, embedding_model)
+                    cur.execute(sql, params)
+                    rows = cur.fetchall()
+                break
+            except psycopg2.errors.UndefinedColumn:
+                # The reduced column was dropped since the reducer was loaded
+                if reducer is None or attempt:
+                    raise
+                self.load_reducer()
+
+        if rows:
+            query_idx, row_ids, row_distances = (np.array(column) for column in zip(*rows))
+            # Rank of each row within its query, rows being ordered by query then distance
+            starts = np.searchsorted(query_idx, query_idx)
+            rank = np.arange(len(rows)) - starts
+            ids[query_idx, rank] = row_ids
+            distances[query_idx, rank] = row_distances
+        return ids, distances
+
+    def source_ids(self, source: str) -> List[int]:
+        """Ids of the documents ingested from a source file"""
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                SELECT id FROM documents
+                WHERE metadata->>'source' = %s
+            """, (source,))
+
+            return [row[0] for row in cur.fetchall()]
+
+    def delete_by_source(self, source: str, keep_ids: Optional[List[int]] = None) -> int:
+        """
+        Delete all documents ingested from a source file
+
+        Args:
+            source: metadata['source'] of the rows to delete
+            keep_ids: Ids to leave in place, e.g. an earlier version's rows
+        """
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("""
+                DELETE FROM documents
+                WHERE metadata->>'source' = %s AND NOT (id = ANY(%s))
+            """, (source, list(keep_ids or [])))
+
+            return cur.rowcount
+
+    def delete_ids(self, ids: List[int]) -> int:
+        """Delete documents by id"""
+        if not ids:
+            return 0
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM documents WHERE id = ANY(%s)", (list(ids),))
+            return cur.rowcount
+
+    def ensure_connected(self):
+        """Reconnect if the connection was closed, e.g. after a long idle period"""
+        if self.conn is None or self.conn.closed:
+            logger.warning("Database connection lost, reconnecting")
+            if self.conn is not None:
+                self.pool.putconn(self.conn, close=True)
+            self.conn = self.pool.getconn()
 
     def close(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
-            logger.info("Database connection closed")
+        """Close all pooled connections"""
+        if self.pool and not self.pool.closed:
+            self.pool.closeall()
+            logger.info("Database connection pool closed")
@@ -1,4 +1,17 @@
-from .text_embedder import TextEmbedder
-from .image_embedder import ImageEmbedder
+import importlib
 
-__all__ = ['TextEmbedder', 'ImageEmbedder']
\ No newline at end of file
+# Submodules are imported on first attribute access, so importing the
+# package does not pull in ollama and numpy
+_MODULES = {
+    'TextEmbedder': '.text_embedder',
+    'ImageEmbedder': '.image_embedder',
+    'HostPool': '.host_pool',
+}
+
+__all__ = ['TextEmbedder', 'ImageEmbedder', 'HostPool']
+
+
+def __getattr__(name):
+    if name in _MODULES:
+        return getattr(importlib.import_module(_MODULES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
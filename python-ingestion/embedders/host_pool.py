@@ -0,0 +1,293 @@
+import ollama
+from typing import Callable, Dict, List, Optional, TypeVar
+from config import config
+import itertools
+import json
+import threading
+import time
+import urllib.request
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+LEAST_OUTSTANDING = 'least-outstanding'
+ROUND_ROBIN = 'round-robin'
+
+
+class NoHealthyHostError(RuntimeError):
+    pass
+
+
+class Host:
+    """One Ollama endpoint with its client, limits and running stats"""
+
+    def __init__(self, url: str, weight: int = 1, max_concurrency: int = 4):
+        self.url = url.rstrip('/')
+        self.weight = max(weight, 1)
+        self.max_concurrency = max_concurrency
+        self.client = ollama.Client(host=self.url)
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.last_failure = 0.0
+        self.total_latency = 0.0
+        self.ewma_latency = 0.0
+        self.current_weight = 0
+
+    def available(self, now: float) -> bool:
+        return self.ejected_until <= now and self.outstanding < self.max_concurrency
+
+    def stats(self) -> Dict:
+        return {
+            'host': self.url,
+            'weight': self.weight,
+            'healthy': self.ejected_until <= time.monotonic(),
+            'outstanding': self.outstanding,
+            'requests': self.requests,
+            'errors': self.errors,
+            'ejections': self.ejections,
+            'mean_latency_ms': self.total_latency / self.requests * 1000 if self.requests else 0.0,
+            'ewma_latency_ms': self.ewma_latency * 1000,
+        }
+
+
+def parse_hosts(spec: str) -> List[tuple]:
+    """
+    Parse "url[=weight],url[=weight],..." into (url, weight) pairs
+
+    e.g. "http://gpu1:11434=3,http://cpu1:11434"
+    """
+    hosts = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, weight = item.rpartition('=') if '=' in item else (item, '', '1')
+        hosts.append((url, int(weight)))
+    return hosts
+
+
+class HostPool:
+    """
+    Dispatches Ollama calls across several hosts
+
+    Hosts are picked by least outstanding requests relative to weight, or by
+    smooth weighted round-robin. Each host has a concurrency limit; callers
+    wait when every host is busy. A host failing max_failures times in a row
+    (calls or health probes) is ejected for eject_seconds and the call is
+    retried on another host. The last host still available is never ejected,
+    and if every untried host is ejected the least recently failed one is
+    used rather than failing the call.
+    """
+
+    def __init__(self, hosts: List[tuple], strategy: str = LEAST_OUTSTANDING,
+                 max_concurrency: int = 4, max_failures: int = 3, eject_seconds: float = 30.0,
+                 retries: int = 2, health_interval: float = 0.0):
+        """
+        Initialize host pool
+
+        Args:
+            hosts: (url, weight) pairs
+            strategy: 'least-outstanding' or 'round-robin'
+            max_concurrency: In-flight requests allowed per host
+            max_failures: Consecutive failures before a host is ejected
+            eject_seconds: How long an ejected host is skipped
+            retries: Extra attempts on other hosts after a failure
+            health_interval: Seconds between background health checks, 0 to disable
+                (never run for a single host, which is never ejected)
+        """
+        if not hosts:
+            raise ValueError("HostPool needs at least one host")
+        if strategy not in (LEAST_OUTSTANDING, ROUND_ROBIN):
+            raise ValueError(f"Unknown balancing strategy: {strategy}")
+        self.hosts = [Host(url, weight, max_concurrency) for url, weight in hosts]
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.retries = retries
+        self._tiebreak = itertools.count()
+        self._condition = threading.Condition()
+
+        if health_interval > 0 and len(self.hosts) > 1:
+            thread = threading.Thread(target=self._health_loop, args=(health_interval,), daemon=True)
+            thread.start()
+
+    @property
+    def capacity(self) -> int:
+        return sum(host.max_concurrency for host in self.hosts)
+
+    def _pick(self, exclude: set) -> Optional[Host]:
+        now = time.monotonic()
+        candidates = [h for h in self.hosts if h not in exclude and h.available(now)]
+        if not candidates:
+            return None
+
+        if self.strategy == ROUND_ROBIN:
+            # Smooth weighted round-robin
+            total = sum(h.weight for h in candidates)
+            for h in candidates:
+                h.current_weight += h.weight
+            chosen = max(candidates, key=lambda h: h.current_weight)
+            chosen.current_weight -= total
+            return chosen
+
+        # Rotate the starting point so idle hosts with equal scores share load
+        offset = next(self._tiebreak) % len(candidates)
+        rotated = candidates[offset:] + candidates[:offset]
+        return min(rotated, key=lambda h: ((h.outstanding + 1) / h.weight, h.ewma_latency))
+
+    def _acquire(self, exclude: set, timeout: Optional[float] = None) -> Host:
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._condition:
+            while True:
+                host = self._pick(exclude)
+                if host:
+                    host.outstanding += 1
+                    return host
+                now = time.monotonic()
+                untried = [h for h in self.hosts if h not in exclude]
+                if not untried:
+                    raise NoHealthyHostError("No healthy Ollama host available: " +
+                                             ", ".join(h.url for h in self.hosts))
+                if all(h.ejected_until > now for h in untried):
+                    # Better to try a host that may have recovered than to fail the call
+                    host = min(untried, key=lambda h: h.last_failure)
+                    if host.outstanding < host.max_concurrency:
+                        host.outstanding += 1
+                        return host
+                remaining = deadline - now if deadline else None
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("Timed out waiting for a free Ollama host")
+                # Wake up for releases, or when the earliest ejection ends
+                next_return = min((h.ejected_until for h in self.hosts if h.ejected_until > now), default=None)
+                wait = min(filter(None, [remaining, next_return - now if next_return else None, 1.0]))
+                self._condition.wait(wait)
+
+    def _release(self, host: Host, latency: float, failed: bool):
+        with self._condition:
+            host.outstanding -= 1
+            host.requests += 1
+            host.total_latency += latency
+            host.ewma_latency = latency if host.requests == 1 else 0.8 * host.ewma_latency + 0.2 * latency
+            if failed:
+                host.errors += 1
+                self._record_failure(host, 'failures')
+            else:
+                host.consecutive_failures = 0
+            self._condition.notify_all()
+
+    def _record_failure(self, host: Host, what: str):
+        """Count a failure and eject host after max_failures in a row; call with the condition held"""
+        now = time.monotonic()
+        host.last_failure = now
+        # Calls already in flight when the host was ejected don't count again
+        if host.ejected_until > now:
+            return
+        host.consecutive_failures += 1
+        if host.consecutive_failures < self.max_failures:
+            return
+        if not any(h is not host and h.ejected_until <= now for h in self.hosts):
+            # Ejecting the last available host would only turn retries into instant failures
+            return
+        host.ejected_until = now + self.eject_seconds
+        host.ejections += 1
+        logger.warning(f"Ejecting Ollama host {host.url} for {self.eject_seconds}s "
+                       f"after {host.consecutive_failures} {what}")
+
+    @staticmethod
+    def _is_host_failure(error: Exception) -> bool:
+        """Connection problems, timeouts, 5xx and missing models count against the host"""
+        if isinstance(error, ollama.ResponseError):
+            return error.status_code >= 500 or error.status_code == 404
+        return isinstance(error, (ConnectionError, OSError, TimeoutError)) or \
+            type(error).__module__.startswith('httpx')
+
+    def call(self, func: Callable[[ollama.Client], T]) -> T:
+        """Run func(client) on a chosen host, retrying elsewhere on host failures"""
+        tried = set()
+        while True:
+            host = self._acquire(tried)
+            start = time.perf_counter()
+            try:
+                result = func(host.client)
+            except Exception as e:
+                failed = self._is_host_failure(e)
+                self._release(host, time.perf_counter() - start, failed)
+                tried.add(host)
+                if not failed or len(tried) > self.retries or len(tried) == len(self.hosts):
+                    raise
+                logger.warning(f"Ollama call to {host.url} failed ({e}), retrying on another host")
+                continue
+            self._release(host, time.perf_counter() - start, False)
+            return result
+
+    def check_health(self, timeout: float = 2.0):
+        """Probe every host's /api/version, counting failures toward ejection and readmitting recovered hosts"""
+        for host in self.hosts:
+            try:
+                with urllib.request.urlopen(f"{host.url}/api/version", timeout=timeout) as response:
+                    json.load(response)
+                healthy = True
+            except Exception as e:
+                logger.warning(f"Health check failed for {host.url}: {e}")
+                healthy = False
+            with self._condition:
+                if healthy:
+                    host.consecutive_failures = 0
+                    host.ejected_until = 0.0
+                else:
+                    self._record_failure(host, 'failed health checks')
+                self._condition.notify_all()
+
+    def _health_loop(self, interval: float):
+        while True:
+            time.sleep(interval)
+            self.check_health()
+
+    def stats(self) -> List[Dict]:
+        with self._condition:
+            return [host.stats() for host in self.hosts]
+
+
+_pools: Dict[str, HostPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(spec: Optional[str] = None) -> HostPool:
+    """
+    Shared pool for a host spec, so embedders using the same hosts share
+    their concurrency limits. Defaults to OLLAMA_HOSTS, then OLLAMA_HOST.
+    """
+    spec = spec or config.OLLAMA_HOSTS or config.OLLAMA_HOST
+    with _pools_lock:
+        if spec not in _pools:
+            _pools[spec] = HostPool(
+                parse_hosts(spec),
+                strategy=config.OLLAMA_BALANCING,
+                max_concurrency=config.OLLAMA_MAX_CONCURRENCY_PER_HOST,
+                health_interval=config.OLLAMA_HEALTH_INTERVAL
+            )
+        return _pools[spec]
+
+
+def pool_stats() -> Dict[str, List[Dict]]:
+    """Per-host stats of every pool created so far"""
+    with _pools_lock:
+        return {spec: pool.stats() for spec, pool in _pools.items()}
+
+
+def format_stats(stats: Dict[str, List[Dict]]) -> str:
+    """Per-host stats as a text table"""
+    lines = [f"{'host':<32}{'healthy':>8}{'requests':>10}{'errors':>8}{'ejected':>9}"
+             f"{'mean ms':>10}{'ewma ms':>10}"]
+    for spec, hosts in stats.items():
+        for host in hosts:
+            lines.append(f"{host['host']:<32}{'yes' if host['healthy'] else 'no':>8}{host['requests']:>10}"
+                         f"{host['errors']:>8}{host['ejections']:>9}"
+                         f"{host['mean_latency_ms']:>10.1f}{host['ewma_latency_ms']:>10.1f}")
+    return '\n'.join(lines)
@@ -1,20 +1,27 @@
-import ollama
+import os
+from typing import Optional
 from config import config
+from metrics import metrics
+from .host_pool import HostPool, get_pool
 
 
 class ImageEmbedder:
-    def __init__(self, model_name: str = None):
+    def __init__(self, model_name: str = None, pool: Optional[HostPool] = None):
         self.model_name = model_name or config.VISION_MODEL
-        self.client = ollama.Client(host=config.OLLAMA_HOST)
+        # Vision calls can be routed to their own (e.g. GPU) hosts
+        self.pool = pool or get_pool(config.OLLAMA_VISION_HOSTS or None)
 
     def describe_image(self, image_path: str) -> str:
         """Generate text description of image for embedding"""
-        response = self.client.chat(
-            model=self.model_name,
-            messages=[{
-                'role': 'user',
-                'content': 'Describe this image in detail for indexing and search purposes. Include objects, colors, scene, text if any, and overall context.',
-                'images': [image_path]
-            }]
-        )
-        return response['message']['content']
\ No newline at end of file
+        if metrics.enabled:
+            metrics.count('vision_bytes', os.path.getsize(image_path))
+        with metrics.timer('describe_image'):
+            response = self.pool.call(lambda client: client.chat(
+                model=self.model_name,
+                messages=[{
+                    'role': 'user',
+                    'content': 'Describe this image in detail for indexing and search purposes. Include objects, colors, scene, text if any, and overall context.',
+                    'images': [image_path]
+                }]
+            ))
+        return response['message']['content']
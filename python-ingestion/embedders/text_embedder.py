@@ -1,29 +1,47 @@
-import ollama
 import numpy as np
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import List, Optional
 from config import config
+from metrics import metrics
+from .host_pool import HostPool, get_pool
 
 
 class TextEmbedder:
-    def __init__(self, model_name: str = None):
+    def __init__(self, model_name: str = None, pool: Optional[HostPool] = None):
         self.model_name = model_name or config.EMBEDDING_MODEL
-        self.client = ollama.Client(host=config.OLLAMA_HOST)
+        self.pool = pool or get_pool()
+        self._executor = None
 
     def embed(self, texts: List[str]) -> np.ndarray:
-        """Generate embeddings for a list of texts"""
-        embeddings = []
-        for text in texts:
-            response = self.client.embeddings(
+        """Generate embeddings for a list of texts, spread over the pool's hosts"""
+        if len(texts) < 2 or len(self.pool.hosts) < 2:
+            return np.array([self.embed_single(text) for text in texts])
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.pool.capacity, thread_name_prefix='embed')
+        # Copy the context so metrics keep the caller's content type label
+        futures = [self._executor.submit(copy_context().run, self.embed_single, text) for text in texts]
+        return np.array([future.result() for future in futures])
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Generate embeddings for a list of texts in one /api/embed call"""
+        if metrics.enabled:
+            metrics.count('embed_bytes', sum(len(text.encode('utf-8')) for text in texts))
+        with metrics.timer('embed_batch'):
+            response = self.pool.call(lambda client: client.embed(
                 model=self.model_name,
-                prompt=text
-            )
-            embeddings.append(response['embedding'])
-        return np.array(embeddings)
+                input=texts
+            ))
+        return np.array(response['embeddings'], dtype=np.float32)
 
     def embed_single(self, text: str) -> np.ndarray:
         """Generate embedding for a single text"""
-        response = self.client.embeddings(
-            model=self.model_name,
-            prompt=text
-        )
-        return np.array(response['embedding'])
\ No newline at end of file
+        if metrics.enabled:
+            metrics.count('embed_bytes', len(text.encode('utf-8')))
+        with metrics.timer('embed'):
+            response = self.pool.call(lambda client: client.embeddings(
+                model=self.model_name,
+                prompt=text
+            ))
+        return np.array(response['embedding'])
@@ -0,0 +1,395 @@
+import numpy as np
+from psycopg2.extras import execute_values
+from typing import Dict, List, Optional, Tuple
+from database import vector_literal, vector_index_sql, parse_vector
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Indexes are built on a session-local copy, so the live index is untouched
+SCRATCH_TABLE = 'index_eval_documents'
+
+IVFFLAT_PROBES = [1, 2, 5, 10, 20, 50, 100]
+HNSW_EF_SEARCH = [10, 20, 40, 80, 160, 320]
+
+
+def exact_neighbors(vectors: np.ndarray, queries: np.ndarray, k: int,
+                    chunk_rows: int = 65536) -> np.ndarray:
+    """
+    Row indices of the k nearest vectors to each query by cosine distance
+
+    Args:
+        vectors: (rows, dimension) matrix
+        queries: (queries, dimension) matrix
+        k: Neighbours per query
+        chunk_rows: Rows scored at a time, bounding memory use
+    """
+    def normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    queries = normalize(queries.astype(np.float32, copy=False))
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_rows = np.empty((len(queries), 0), dtype=np.int64)
+
+    for start in range(0, len(vectors), chunk_rows):
+        chunk = normalize(vectors[start:start + chunk_rows].astype(np.float32, copy=False))
+        scores = np.concatenate([best_scores, queries @ chunk.T], axis=1)
+        rows = np.concatenate([best_rows, np.broadcast_to(
+            np.arange(start, start + len(chunk)), (len(queries), len(chunk)))], axis=1)
+        keep = np.argpartition(-scores, min(k, scores.shape[1]) - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+        best_rows = np.take_along_axis(rows, keep, axis=1)
+
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_rows, order, axis=1)
+
+
+def cosine_distances(vectors: np.ndarray, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Distance from each query to the given rows of vectors, rows shaped (queries, n)"""
+    selected = vectors[rows]
+    dots = np.einsum('qd,qnd->qn', queries, selected)
+    norms = np.linalg.norm(selected, axis=2) * np.linalg.norm(queries, axis=1, keepdims=True)
+    return 1.0 - dots / np.where(norms == 0, 1, norms)
+
+
+def recall_at_k(found_distances: np.ndarray, kth_distances: np.ndarray, tolerance: float = 1e-5) -> float:
+    """
+    Mean fraction of each query's top-k that was found
+
+    A returned row counts when it is no further than the true k-th
+    neighbour, so duplicate vectors tied at the boundary are not misses.
+    Missing results are passed as inf.
+    """
+    hits = (found_distances <= kth_distances[:, None] + tolerance).sum(axis=1)
+    return float(np.mean(np.minimum(hits, found_distances.shape[1]) / found_distances.shape[1]))
+
+
+def default_sweep(rows: int, lists: Optional[List[int]] = None, probes: Optional[List[int]] = None,
+                  hnsw: bool = True, m: int = 16, ef_construction: int = 64,
+                  ef_search: Optional[List[int]] = None) -> List[Tuple[str, Dict[str, int], str, List[int]]]:
+    """
+    (method, index options, search setting, setting values) to try
+
+    By default ivfflat covers the current lists = 100 plus pgvector's
+    rows / 1000 and sqrt(rows) rules of thumb, and hnsw its default build
+    parameters.
+    """
+    lists = lists or sorted({100, max(rows // 1000, 10), max(int(np.sqrt(rows)), 10)})
+    probes = probes or IVFFLAT_PROBES
+    sweep = [('ivfflat', {'lists': n}, 'ivfflat.probes', [p for p in probes if p <= n])
+             for n in lists]
+    if hnsw:
+        sweep.append(('hnsw', {'m': m, 'ef_construction': ef_construction},
+                      'hnsw.ef_search', ef_search or HNSW_EF_SEARCH))
+    return sweep
+
+
+class IndexEvaluation:
+    """
+    Measures recall@k and latency of vector index configurations
+
+    Stored embeddings are copied to a temporary table and a sample of them
+    is used as queries. Exact neighbours are computed with NumPy, then each
+    index configuration is built on the copy and queried one query at a
+    time across its search setting values.
+
+    After use_reducer(), the same measurements run on a reduced-dimension
+    copy of the vectors: candidates come from the reduced column and are
+    re-ranked by full-vector distance, as Database does in reduced mode.
+    """
+
+    def __init__(self, db, k: int = 10, num_queries: int = 200, seed: int = 42,
+                 column: str = 'embedding', oversample: int = 4):
+        """
+        Initialize evaluation
+
+        Args:
+            db: Database to sample
+            k: Neighbours per query
+            num_queries: Stored embeddings used as queries
+            seed: Seed for the query sample
+            column: Vector column to evaluate
+            oversample: Candidates per result fetched from a reduced column
+        """
+        self.db = db
+        self.k = k
+        self.num_queries = num_queries
+        self.seed = seed
+        self.column = column
+        self.ids = None
+        self.vectors = None
+        self.queries = None
+        self.truth = None
+        self.kth_distances = None
+        self.oversample = oversample
+        self.reducer = None
+        self.reduced_queries = None
+
+    def snapshot(self, batch_size: int = 10000):
+        """
+        Copy the embeddings to the scratch table and load them for ground truth
+
+        Rows are streamed through a server-side cursor into preallocated
+        float32 arrays, so memory stays at the vectors themselves.
+        """
+        with self.db.conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE};")
+            cur.execute(f"""
+                CREATE TEMP TABLE {SCRATCH_TABLE} AS
+                SELECT id, {self.column} AS embedding FROM documents
+                WHERE {self.column} IS NOT NULL
+            """)
+            cur.execute(f"ANALYZE {SCRATCH_TABLE};")
+            cur.execute(f"SELECT count(*), max(vector_dims(embedding)) FROM {SCRATCH_TABLE}")
+            count, dimension = cur.fetchone()
+
+        if count < self.k:
+            self.db.conn.commit()
+            raise ValueError(f"Need at least {self.k} stored embeddings, found {count}")
+        self.ids = np.empty(count, dtype=np.int64)
+        self.vectors = np.empty((count, dimension), dtype=np.float32)
+
+        loaded = 0
+        with self.db.conn.cursor(name='index_eval_snapshot') as cur:
+            cur.itersize = batch_size
+            # Text parses much faster with NumPy than per-row vector adaptation
+            cur.execute(f"SELECT id, embedding::text FROM {SCRATCH_TABLE} ORDER BY id")
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                self.ids[loaded:loaded + len(rows)] = [row[0] for row in rows]
+                self.vectors[loaded:loaded + len(rows)] = np.vstack([parse_vector(row[1]) for row in rows])
+                loaded += len(rows)
+        self.db.conn.commit()
+
+        rng = np.random.default_rng(self.seed)
+        sample = rng.choice(count, size=min(self.num_queries, count), replace=False)
+        self.queries = self.vectors[sample]
+
+        start = time.perf_counter()
+        truth_rows = exact_neighbors(self.vectors, self.queries, self.k)
+        self.truth = self.ids[truth_rows]
+        self.kth_distances = cosine_distances(self.vectors, self.queries, truth_rows[:, -1:])[:, 0]
+        logger.info(f"Ground truth for {len(self.queries)} queries over {count} vectors "
+                    f"in {time.perf_counter() - start:.2f}s")
+
+    @property
+    def index_column(self) -> str:
+        return 'embedding_reduced' if self.reducer else 'embedding'
+
+    def use_reducer(self, reducer):
+        """Evaluate candidate generation on reducer's output from now on (None for full vectors)"""
+        self.reducer = reducer
+        if reducer is None:
+            self.reduced_queries = None
+            return
+
+        reduced = reducer.reduce(self.vectors)
+        self.reduced_queries = reducer.reduce(self.queries)
+        with self.db.conn.cursor() as cur:
+            cur.execute(f"ALTER TABLE {SCRATCH_TABLE} DROP COLUMN IF EXISTS embedding_reduced;")
+            cur.execute(f"ALTER TABLE {SCRATCH_TABLE} ADD COLUMN embedding_reduced vector({reducer.dimension});")
+            execute_values(cur, f"""
+                UPDATE {SCRATCH_TABLE} AS t
+                SET embedding_reduced = v.embedding::vector
+                FROM (VALUES %s) AS v(id, embedding)
+                WHERE t.id = v.id
+            """, ((int(row_id), vector_literal(vector)) for row_id, vector in zip(self.ids, reduced)),
+                page_size=1000)
+            cur.execute(f"ANALYZE {SCRATCH_TABLE};")
+        self.db.conn.commit()
+
+    def _query(self) -> Tuple[str, List[tuple]]:
+        """SQL and per-query parameters for the current mode"""
+        literals = [vector_literal(query) for query in self.queries]
+        if self.reducer is None:
+            sql = f"""
+                SELECT id FROM {SCRATCH_TABLE}
+                ORDER BY embedding <=> %s::vector
+                LIMIT %s
+            """
+            return sql, [(literal, self.k) for literal in literals]
+
+        sql = f"""
+            SELECT id FROM (
+                SELECT id, embedding FROM {SCRATCH_TABLE}
+                ORDER BY embedding_reduced <=> %s::vector
+                LIMIT %s
+            ) candidates
+            ORDER BY embedding <=> %s::vector
+            LIMIT %s
+        """
+        return sql, [(vector_literal(reduced), self.k * self.oversample, literal, self.k)
+                     for reduced, literal in zip(self.reduced_queries, literals)]
+
+    def _run_queries(self, cur) -> Tuple[np.ndarray, np.ndarray]:
+        """Run every query on its own, returning (ids, latencies in seconds)"""
+        found = np.full((len(self.queries), self.k), -1, dtype=np.int64)
+        latencies = np.empty(len(self.queries))
+        sql, params = self._query()
+        # Warm the cache so the first configuration is not penalised
+        for query_params in params[:10]:
+            cur.execute(sql, query_params)
+            cur.fetchall()
+        for i, query_params in enumerate(params):
+            start = time.perf_counter()
+            cur.execute(sql, query_params)
+            rows = cur.fetchall()
+            latencies[i] = time.perf_counter() - start
+            found[i, :len(rows)] = [row[0] for row in rows]
+        return found, latencies
+
+    def _result(self, index: str, params: str, found: np.ndarray, latencies: np.ndarray,
+                build_s: float = 0.0, size_bytes: int = 0, settings: Optional[Dict] = None) -> Dict:
+        return {
+            'index': index,
+            'dimension': self.reducer.dimension if self.reducer else self.vectors.shape[1],
+            'reduction': self.reducer.method if self.reducer else None,
+            'params': params,
+            'settings': settings or {},
+            'recall': self.recall(found),
+            'p50_ms': float(np.percentile(latencies, 50) * 1000),
+            'p95_ms': float(np.percentile(latencies, 95) * 1000),
+            'qps': float(1.0 / latencies.mean()),
+            'build_s': build_s,
+            'size_mb': size_bytes / 1e6,
+        }
+
+    def recall(self, found: np.ndarray) -> float:
+        """recall@k of returned ids (-1 for missing) against the exact neighbours"""
+        rows = np.searchsorted(self.ids, np.where(found >= 0, found, self.ids[0]))
+        distances = cosine_distances(self.vectors, self.queries, rows)
+        return recall_at_k(np.where(found >= 0, distances, np.inf), self.kth_distances)
+
+    def evaluate_exact(self) -> Dict:
+        """Sequential scan baseline"""
+        with self.db.conn.cursor() as cur:
+            self._drop_indexes(cur)
+            found, latencies = self._run_queries(cur)
+        self.db.conn.commit()
+        return self._result('exact', 'seq scan', found, latencies)
+
+    def evaluate_index(self, method: str, options: Dict[str, int], setting: str,
+                       values: List[int]) -> List[Dict]:
+        """Build one index on the scratch table and query it at each search setting value"""
+        index_name = f"{SCRATCH_TABLE}_{self.index_column}_idx"
+        params = ', '.join(f"{name}={value}" for name, value in options.items())
+        logger.info(f"Building {method} ({params}) on {self.index_column}")
+
+        with self.db.conn.cursor() as cur:
+            self._drop_indexes(cur)
+            start = time.perf_counter()
+            cur.execute(vector_index_sql(SCRATCH_TABLE, self.index_column, method, options))
+            build_s = time.perf_counter() - start
+            cur.execute("SELECT pg_relation_size(%s::regclass)", (index_name,))
+            size_bytes = cur.fetchone()[0]
+            self.db.conn.commit()
+
+        results = []
+        with self.db.conn.cursor() as cur:
+            # Measure the index even where the planner would prefer a small seq scan
+            cur.execute("SET enable_seqscan = off;")
+            for value in values:
+                cur.execute(f"SET {setting} = {int(value)};")
+                found, latencies = self._run_queries(cur)
+                results.append(self._result(method, params, found, latencies, build_s, size_bytes,
+                                            {**options, setting: value}))
+            cur.execute(f"RESET {setting};")
+            cur.execute("RESET enable_seqscan;")
+        self.db.conn.commit()
+        return results
+
+    @staticmethod
+    def _drop_indexes(cur):
+        for column in ('embedding', 'embedding_reduced'):
+            cur.execute(f"DROP INDEX IF EXISTS {SCRATCH_TABLE}_{column}_idx;")
+
+    def run(self, sweep: Optional[List[Tuple]] = None, reducers: Optional[List] = None) -> List[Dict]:
+        """
+        Evaluate the exact baseline and every configuration in the sweep,
+        on the full vectors and then for each reducer
+        """
+        if self.truth is None:
+            self.snapshot()
+        sweep = sweep or default_sweep(len(self.ids))
+
+        results = []
+        for reducer in [None] + list(reducers or []):
+            self.use_reducer(reducer)
+            results.append(self.evaluate_exact())
+            for method, options, setting, values in sweep:
+                try:
+                    results.extend(self.evaluate_index(method, options, setting, values))
+                except Exception as e:
+                    self.db.conn.rollback()
+                    logger.warning(f"Skipping {method} {options}: {e}")
+        self.use_reducer(None)
+        return results
+
+    def close(self):
+        """Drop the scratch table, also after a run that failed mid-transaction"""
+        self.db.conn.rollback()
+        with self.db.conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {SCRATCH_TABLE};")
+        self.db.conn.commit()
+
+
+def recommend(results: List[Dict], target_recall: float) -> Optional[Dict]:
+    """Fastest (by p95) index configuration meeting target_recall, else the most accurate one"""
+    candidates = [r for r in results if r['index'] != 'exact']
+    if not candidates:
+        return None
+    meeting = [r for r in candidates if r['recall'] >= target_recall]
+    if meeting:
+        return min(meeting, key=lambda r: (r['p95_ms'], r['size_mb']))
+    return max(candidates, key=lambda r: (r['recall'], -r['p95_ms']))
+
+
+def recommended_env(result: Dict, oversample: int = 4) -> str:
+    """Config settings reproducing a recommended configuration"""
+    settings = result['settings']
+    if result['index'] == 'hnsw':
+        env = (f"VECTOR_INDEX=hnsw HNSW_M={settings['m']} HNSW_EF_CONSTRUCTION={settings['ef_construction']} "
+               f"HNSW_EF_SEARCH={settings['hnsw.ef_search']}")
+    else:
+        env = (f"VECTOR_INDEX=ivfflat IVFFLAT_LISTS={settings['lists']} "
+               f"IVFFLAT_PROBES={settings['ivfflat.probes']}")
+    if result['reduction']:
+        env += (f" REDUCED_DIMENSION={result['dimension']} REDUCTION={result['reduction']} "
+                f"RERANK_OVERSAMPLE={oversample}")
+    return env
+
+
+def _search_label(result: Dict) -> str:
+    return ', '.join(f"{name.split('.')[-1]}={value}" for name, value in result['settings'].items()
+                     if '.' in name)
+
+
+def _dimension_label(result: Dict) -> str:
+    return f"{result['dimension']} {result['reduction']}" if result['reduction'] else str(result['dimension'])
+
+
+def format_report(results: List[Dict], k: int, target_recall: float, oversample: int = 4) -> str:
+    """Recall/latency table with the recommendation"""
+    lines = [f"{'dim':<16}{'index':<9}{'params':<28}{'search':<20}{f'recall@{k}':>10}{'p50 ms':>9}"
+             f"{'p95 ms':>9}{'qps':>9}{'build s':>9}{'size MB':>9}"]
+    for r in results:
+        lines.append(f"{_dimension_label(r):<16}{r['index']:<9}{r['params']:<28}{_search_label(r):<20}"
+                     f"{r['recall']:>10.3f}"
+                     f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['qps']:>9.0f}"
+                     f"{r['build_s']:>9.2f}{r['size_mb']:>9.1f}")
+
+    best = recommend(results, target_recall)
+    if best:
+        met = 'meets' if best['recall'] >= target_recall else 'best available, below'
+        lines.append("")
+        lines.append(f"Recommended ({met} target recall {target_recall}): {best['index']} {best['params']}, "
+                     f"{_search_label(best)} at {_dimension_label(best)} dimensions "
+                     f"-> recall@{k} {best['recall']:.3f}, p95 {best['p95_ms']:.2f} ms")
+        lines.append(f"  {recommended_env(best, oversample)}")
+        if best['reduction']:
+            lines.append(f"  then: python main.py reduce --dimension {best['dimension']} --method {best['reduction']}")
+    return '\n'.join(lines)
@@ -1,22 +1,74 @@
 import os
-from typing import Optional
-from embedders import TextEmbedder, ImageEmbedder
-from processors import TextProcessor, ImageProcessor, PDFProcessor
-from database import Database
+from contextlib import nullcontext
+from functools import cached_property
+from typing import Optional, TYPE_CHECKING
+from processors import TextProcessor, ImageProcessor
+from metrics import metrics
 import logging
 
+if TYPE_CHECKING:
+    from database import Database
+    from embedders import TextEmbedder, ImageEmbedder
+    from processors import PDFProcessor
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class MultimodalIngestion:
-    def __init__(self):
-        self.db = Database()
-        self.text_embedder = TextEmbedder()
-        self.image_embedder = ImageEmbedder()
+    """
+    Ingests text, images and PDFs into the vector store
+
+    Components are built on first use, so their heavy dependencies (ollama,
+    numpy, PyMuPDF, psycopg2) are only imported and the database only
+    connected once a file actually needs them.
+    """
+
+    def __init__(self, db: Optional['Database'] = None, profiler=None):
+        self._db = db
+        self.profiler = profiler
         self.text_processor = TextProcessor()
         self.image_processor = ImageProcessor()
-        self.pdf_processor = PDFProcessor()
-
+        if profiler:
+            # Build components now, so their imports are not charged to the first profiled file
+            for component in ('text_embedder', 'image_embedder', 'pdf_processor'):
+                getattr(self, component)
+
+    @property
+    def db(self) -> 'Database':
+        if self._db is None:
+            from database import Database
+            self._db = Database()
+        return self._db
+
+    @cached_property
+    def text_embedder(self) -> 'TextEmbedder':
+        return self._text_embedder_for_store()
+
+    def _text_embedder_for_store(self) -> 'TextEmbedder':
+        """Embedder for the model the stored vectors come from, EMBEDDING_MODEL until a reembed swap"""
+        from embedders import TextEmbedder
+        from config import config
+        active = self.db.embedding_model()
+        if active and active[0] != config.EMBEDDING_MODEL:
+            logger.info(f"Using {active[0]} recorded by the last reembed swap "
+                        f"instead of EMBEDDING_MODEL={config.EMBEDDING_MODEL}")
+        return TextEmbedder(active[0] if active else None)
+
+    @cached_property
+    def image_embedder(self) -> 'ImageEmbedder':
+        from embedders import ImageEmbedder
+        return ImageEmbedder()
+
+    @cached_property
+    def pdf_processor(self) -> 'PDFProcessor':
+        from processors import PDFProcessor
+        return PDFProcessor()
+
+    def profile_file(self, file_path: str):
+        """Context for ingesting one file, profiled if a profiler is attached"""
+        return self.profiler.file(file_path) if self.profiler else nullcontext()
+
+    @metrics.instrument('ingest_file', 'text')
     def ingest_text(self, text: str, metadata: Optional[dict] = None):
         """Ingest plain text"""
         # Clean text
@@ -25,9 +77,9 @@ class MultimodalIngestion:
         # Chunk if text is long
         chunks = self.text_processor.chunk_text(cleaned)
 
-        for i, chunk in enumerate(chunks):
-            embedding = self.text_embedder.embed_single(chunk)
+        embeddings = self.text_embedder.embed(chunks)
 
+        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
             chunk_metadata = metadata.copy() if metadata else {}
             chunk_metadata['chunk_number'] = i
             chunk_metadata['total_chunks'] = len(chunks)
@@ -36,11 +88,13 @@ class MultimodalIngestion:
                 content = chunk,
                 embedding = embedding.tolist(),
                 content_type = 'text',
-                metadata = chunk_metadata
+                metadata = chunk_metadata,
+                embedding_model = self.text_embedder.model_name
             )
 
             logger.info(f"Ingested text chunk {i+1}/{len(chunks)}, doc_id: {doc_id}")
 
+    @metrics.instrument('ingest_file', 'image')
     def ingest_image(self, image_path: str, metadata: Optional[dict] = None):
         """Ingest image by describing it and embedding the description"""
         if not self.image_processor.is_valid_image(image_path):
@@ -67,115 +121,178 @@ class MultimodalIngestion:
             content=description,
             embedding=embedding.tolist(),
             content_type='image',
-            metadata=final_metadata
+            metadata=final_metadata,
+            embedding_model=self.text_embedder.model_name
         )
 
         logger.info(f"Inserted image: {image_path}, doc_id: {doc_id}")
 
+    @metrics.instrument('ingest_file', 'pdf')
     def ingest_pdf(self, pdf_path: str, metadata: Optional[dict] = None):
         """Ingest PDF by extracting multimodal content from each page"""
         pages = self.pdf_processor.extract_pages(pdf_path)
 
         for page in pages:
-            page_num = page['page_number']
-            total_pages = page['metadata']['total_pages']
-
-            # 1. Process text content
-            text = self.text_processor.clean_text(page['text'])
-            if text.strip():
-                chunks = self.text_processor.chunk_text(text)
-
-                for i, chunk in enumerate(chunks):
-                    embedding = self.text_embedder.embed_single(chunk)
-
-                    chunk_metadata = metadata.copy() if metadata else {}
-                    chunk_metadata['pdf_path'] = pdf_path
-                    chunk_metadata['page_number'] = page_num
-                    chunk_metadata['chunk_index'] = i
-                    chunk_metadata['total_chunks'] = len(chunks)
-                    chunk_metadata['total_pages'] = total_pages
-                    chunk_metadata['content_subtype'] = 'text'
-
-                    doc_id = self.db.insert_document(
-                        content=chunk,
-                        embedding=embedding.tolist(),
-                        content_type='pdf',
-                        metadata=chunk_metadata
-                    )
-
-                logger.info(f"Ingested {len(chunks)} text chunks from page {page_num}/{total_pages}")
-
-            # 2. Process extracted images
-            for img_data in page['images']:
-                try:
-                    # Use vision model to describe the image
-                    description = self.image_embedder.describe_image(img_data['image_path'])
-                    logger.info(f"Image description (page {page_num}, img {img_data['image_index']}): {description[:100]}...")
-
-                    # Embed the description
-                    embedding = self.text_embedder.embed_single(description)
-
-                    img_metadata = metadata.copy() if metadata else {}
-                    img_metadata['pdf_path'] = pdf_path
-                    img_metadata['page_number'] = page_num
-                    img_metadata['total_pages'] = total_pages
-                    img_metadata['content_subtype'] = 'image'
-                    img_metadata['image_index'] = img_data['image_index']
-                    img_metadata['image_size'] = img_data['size']
-                    img_metadata['image_format'] = img_data['format']
-                    img_metadata['description'] = description
-
-                    doc_id = self.db.insert_document(
-                        content=description,
-                        embedding=embedding.tolist(),
-                        content_type='pdf',
-                        metadata=img_metadata
-                    )
-
-                    logger.info(f"Ingested image from page {page_num}/{total_pages}, doc_id: {doc_id}")
-
-                except Exception as e:
-                    logger.error(f"Failed to process image on page {page_num}: {e}")
-
-            # 3. Process detected tables
-            for table_idx, table in enumerate(page['tables']):
-                try:
-                    # For tables, we store metadata about their location
-                    # The text content should already be captured in the text chunks above
-                    table_metadata = metadata.copy() if metadata else {}
-                    table_metadata['pdf_path'] = pdf_path
-                    table_metadata['page_number'] = page_num
-                    table_metadata['total_pages'] = total_pages
-                    table_metadata['content_subtype'] = 'table'
-                    table_metadata['table_index'] = table_idx
-                    table_metadata['table_bbox'] = table['bbox']
-                    table_metadata['table_confidence'] = table['confidence']
-
-                    # We could extract text from the table region specifically
-                    # For now, just log that we detected it
-                    logger.info(f"Detected table on page {page_num} at {table['bbox']}")
-
-                except Exception as e:
-                    logger.error(f"Failed to process table on page {page_num}: {e}")
+            with metrics.timer('ingest_page'):
+                self._ingest_pdf_page(pdf_path, page, metadata)
+
+    def _ingest_pdf_page(self, pdf_path: str, page: dict, metadata: Optional[dict] = None):
+        """Ingest text chunks, images and tables from one extracted PDF page"""
+        page_num = page['page_number']
+        total_pages = page['metadata']['total_pages']
+
+        # 1. Process text content
+        text = self.text_processor.clean_text(page['text'])
+        if text.strip():
+            chunks = self.text_processor.chunk_text(text)
+
+            embeddings = self.text_embedder.embed(chunks)
+
+            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+                chunk_metadata = metadata.copy() if metadata else {}
+                chunk_metadata['pdf_path'] = pdf_path
+                chunk_metadata['page_number'] = page_num
+                chunk_metadata['chunk_index'] = i
+                chunk_metadata['total_chunks'] = len(chunks)
+                chunk_metadata['total_pages'] = total_pages
+                chunk_metadata['content_subtype'] = 'text'
+
+                doc_id = self.db.insert_document(
+                    content=chunk,
+                    embedding=embedding.tolist(),
+                    content_type='pdf',
+                    metadata=chunk_metadata,
+                    embedding_model=self.text_embedder.model_name
+                )
+
+            logger.info(f"Ingested {len(chunks)} text chunks from page {page_num}/{total_pages}")
+
+        # 2. Process extracted images
+        for img_data in page['images']:
+            try:
+                # Use vision model to describe the image
+                description = self.image_embedder.describe_image(img_data['image_path'])
+                logger.info(f"Image description (page {page_num}, img {img_data['image_index']}): {description[:100]}...")
+
+                # Embed the description
+                embedding = self.text_embedder.embed_single(description)
+
+                img_metadata = metadata.copy() if metadata else {}
+                img_metadata['pdf_path'] = pdf_path
+                img_metadata['page_number'] = page_num
+                img_metadata['total_pages'] = total_pages
+                img_metadata['content_subtype'] = 'image'
+                img_metadata['image_index'] = img_data['image_index']
+                img_metadata['image_size'] = img_data['size']
+                img_metadata['image_format'] = img_data['format']
+                img_metadata['description'] = description
+
+                doc_id = self.db.insert_document(
+                    content=description,
+                    embedding=embedding.tolist(),
+                    content_type='pdf',
+                    metadata=img_metadata,
+                    embedding_model=self.text_embedder.model_name
+                )
+
+                logger.info(f"Ingested image from page {page_num}/{total_pages}, doc_id: {doc_id}")
+
+            except Exception as e:
+                logger.error(f"Failed to process image on page {page_num}: {e}")
+
+        # 3. Process detected tables
+        for table_idx, table in enumerate(page['tables']):
+            try:
+                # For tables, we store metadata about their location
+                # The text content should already be captured in the text chunks above
+                table_metadata = metadata.copy() if metadata else {}
+                table_metadata['pdf_path'] = pdf_path
+                table_metadata['page_number'] = page_num
+                table_metadata['total_pages'] = total_pages
+                table_metadata['content_subtype'] = 'table'
+                table_metadata['table_index'] = table_idx
+                table_metadata['table_bbox'] = table['bbox']
+                table_metadata['table_confidence'] = table['confidence']
+
+                # We could extract text from the table region specifically
+                # For now, just log that we detected it
+                logger.info(f"Detected table on page {page_num} at {table['bbox']}")
+
+            except Exception as e:
+                logger.error(f"Failed to process table on page {page_num}: {e}")
+
+    @staticmethod
+    def is_supported(file_path: str) -> bool:
+        """Check if ingest_path can handle the file"""
+        ext = os.path.splitext(file_path)[1].lower()
+        return ext in ('.pdf', '.txt') or ext in ImageProcessor.SUPPORTED_FORMATS
+
+    def ingest_path(self, file_path: str) -> bool:
+        """
+        Ingest one file, dispatching on its extension
+
+        Rows are tagged with metadata['source'] = file_path so they can be
+        found again by remove_file(). Returns False for unsupported files.
+        """
+        from database import EmbeddingModelMismatch
+
+        ext = os.path.splitext(file_path)[1].lower()
+
+        try:
+            with self.profile_file(file_path):
+                if ext == '.pdf':
+                    self.ingest_pdf(file_path, {'source': file_path})
+                elif ext in ImageProcessor.SUPPORTED_FORMATS:
+                    self.ingest_image(file_path, {'source': file_path})
+                elif ext == '.txt':
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        self.ingest_text(f.read(), {'source': file_path})
+                else:
+                    return False
+        except EmbeddingModelMismatch as e:
+            # A reembed swap happened mid-run: later files use the new model
+            logger.warning(f"{e}; switching to {e.active_model}")
+            self.text_embedder = self._text_embedder_for_store()
+            raise
+        return True
+
+    def remove_file(self, file_path: str) -> int:
+        """Delete all rows ingested from file_path, returns the number removed"""
+        removed = self.db.delete_by_source(file_path)
+        logger.info(f"Removed {removed} rows for {file_path}")
+        return removed
+
+    def replace_file(self, file_path: str) -> bool:
+        """
+        Re-ingest a changed file, then delete the rows of its previous version
+
+        The old rows are only removed once the new version is fully stored;
+        if ingestion fails, its partial rows are deleted instead and the
+        error is raised with the previous version still searchable.
+        """
+        old_ids = self.db.source_ids(file_path)
+        try:
+            ingested = self.ingest_path(file_path)
+        except Exception:
+            self.db.delete_by_source(file_path, keep_ids=old_ids)
+            raise
+        if ingested:
+            removed = self.db.delete_ids(old_ids)
+            logger.info(f"Replaced {removed} rows for {file_path}")
+        return ingested
 
     def ingest_directory(self, directory_path: str):
         """Ingest all supported files from a directory"""
         for root, dirs, files in os.walk(directory_path):
             for file in files:
                 file_path = os.path.join(root, file)
-                ext = os.path.splitext(file)[1].lower()
 
                 try:
-                    if ext == '.pdf':
-                        self.ingest_pdf(file_path, {'source': file_path})
-                    elif ext in ImageProcessor.SUPPORTED_FORMATS:
-                        self.ingest_image(file_path, {'source': file_path})
-                    elif ext == '.txt':
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            self.ingest_text(f.read(), {'source': file_path})
+                    self.ingest_path(file_path)
                 except Exception as e:
                     logger.error(f"Failed to ingest {file_path}: {e}")
 
     def close(self):
         """Close database connection"""
-        self.db.close()
+        if self._db is not None:
+            self._db.close()
@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 import argparse
 import sys
-from ingestion import MultimodalIngestion
-from database import Database
+from typing import Optional, TYPE_CHECKING
 import logging
 
+# Command modules are imported inside the commands that need them, so
+# startup only pays for the dependencies of the command being run
+if TYPE_CHECKING:
+    from profiling import Profiler
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -14,6 +18,8 @@ logger = logging.getLogger(__name__)
 
 def setup_database():
     """Initialize database schema"""
+    from database import Database
+
     logger.info("Setting up database...")
     db = Database(register_vector_type=False)
     db.setup()
@@ -21,29 +27,26 @@ def setup_database():
     logger.info("Database setup complete!")
 
 
-def ingest_file(file_path: str):
+def ingest_file(file_path: str, profiler: Optional['Profiler'] = None):
     """Ingest a single file"""
+    from ingestion import MultimodalIngestion
+
     logger.info(f"Ingesting file: {file_path}")
-    ingestion = MultimodalIngestion()
+    ingestion = MultimodalIngestion(profiler=profiler)
 
     try:
-        if file_path.endswith('.pdf'):
-            ingestion.ingest_pdf(file_path)
-        elif file_path.endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')):
-            ingestion.ingest_image(file_path)
-        elif file_path.endswith('.txt'):
-            with open(file_path, 'r') as f:
-                ingestion.ingest_text(f.read(), {'source': file_path})
-        else:
+        if not ingestion.ingest_path(file_path):
             logger.error(f"Unsupported file type: {file_path}")
     finally:
         ingestion.close()
 
 
-def ingest_directory(directory_path: str):
+def ingest_directory(directory_path: str, profiler: Optional['Profiler'] = None):
     """Ingest all files from a directory"""
+    from ingestion import MultimodalIngestion
+
     logger.info(f"Ingesting directory: {directory_path}")
-    ingestion = MultimodalIngestion()
+    ingestion = MultimodalIngestion(profiler=profiler)
 
     try:
         ingestion.ingest_directory(directory_path)
@@ -51,6 +54,212 @@ def ingest_directory(directory_path: str):
         ingestion.close()
 
 
+def watch_directory(directory_path: str, debounce: float, batch_size: int,
+                    batch_window: float, poll_interval: float, force_polling: bool):
+    """Continuously ingest new, changed and deleted files under a directory"""
+    from ingestion import MultimodalIngestion
+    from watcher import watch
+
+    logger.info(f"Watching directory: {directory_path}")
+    ingestion = MultimodalIngestion()
+
+    try:
+        watch(ingestion, directory_path, debounce=debounce, batch_size=batch_size,
+              batch_window=batch_window, poll_interval=poll_interval,
+              force_polling=force_polling)
+    finally:
+        ingestion.close()
+
+
+def export_store(path: str, file_format: Optional[str], batch_size: int):
+    """Export documents and embeddings to a Parquet/Arrow file"""
+    from database import Database
+    from transfer import export_documents
+
+    db = Database()
+    try:
+        export_documents(db, path, file_format, batch_size)
+    finally:
+        db.close()
+
+
+def import_store(path: str, file_format: Optional[str], batch_size: int,
+                 allow_model_mismatch: bool = False):
+    """Bulk load documents and embeddings from a Parquet/Arrow file"""
+    from database import Database
+    from transfer import import_documents
+
+    db = Database(register_vector_type=False)
+    try:
+        import_documents(db, path, file_format, batch_size, allow_model_mismatch)
+    finally:
+        db.close()
+
+
+def reembed_store(args):
+    """Migrate stored embeddings to a new model without downtime"""
+    from database import Database
+    from reembed import ReembedMigration
+
+    db = Database()
+    try:
+        if args.abort or args.drop_previous:
+            migration = ReembedMigration(db, embedder=None)
+            if args.abort:
+                migration.abort()
+            if args.drop_previous:
+                migration.drop_previous()
+            return
+
+        if not args.model:
+            logger.error("reembed needs --model (or --abort / --drop-previous)")
+            sys.exit(1)
+
+        from embedders import TextEmbedder
+        migration = ReembedMigration(db, TextEmbedder(args.model), batch_size=args.batch_size,
+                                     max_rows_per_second=args.max_rows_per_second)
+        result = migration.run(dimension=args.dimension, swap=not args.no_swap)
+        if result['status'] == 'swapped':
+            logger.info(f"Ingestion now uses {result['model']} (recorded in embedding_migrations); "
+                        f"set EMBEDDING_MODEL={result['model']} and VECTOR_DIMENSION={result['dimension']}, "
+                        f"and Ollama:EmbeddingModel for the .NET API, then restart it")
+    finally:
+        db.close()
+
+
+def evaluate_index(args):
+    """Measure recall and latency of vector index configurations on the stored embeddings"""
+    import json
+    from database import Database
+    from index_eval import IndexEvaluation, default_sweep, format_report
+    from reduction import create_reducer
+
+    db = Database()
+    evaluation = IndexEvaluation(db, k=args.k, num_queries=args.queries, seed=args.seed,
+                                 oversample=args.oversample)
+    try:
+        evaluation.snapshot()
+        sweep = default_sweep(len(evaluation.ids), lists=args.lists, probes=args.probes,
+                              hnsw=not args.no_hnsw, m=args.hnsw_m,
+                              ef_construction=args.hnsw_ef_construction, ef_search=args.ef_search)
+        # PCA is fitted on (a sample of) the snapshot itself
+        sample = evaluation.vectors[:args.pca_sample]
+        reducers = [create_reducer(args.reduction, dimension, sample) for dimension in args.reduced_dims or []]
+        results = evaluation.run(sweep, reducers)
+    finally:
+        try:
+            evaluation.close()
+        finally:
+            db.close()
+
+    print(format_report(results, args.k, args.target_recall, args.oversample))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+def reduce_dimensions(args):
+    """Build (or drop) the reduced-dimension column used for candidate generation"""
+    from database import Database
+    import reduction
+
+    db = Database()
+    try:
+        if args.drop:
+            reduction.drop_reduced(db)
+            logger.info("Dropped the reduced column; unset REDUCED_DIMENSION")
+            return
+
+        sample = None
+        if args.method == 'pca':
+            sample = reduction.sample_embeddings(db, args.sample)
+        reducer = reduction.create_reducer(args.method, args.dimension, sample)
+        if args.method == 'pca':
+            reduction.save_projection(db, reducer)
+        reduction.backfill(db, reducer, args.batch_size)
+        logger.info(f"Set REDUCED_DIMENSION={args.dimension} and REDUCTION={args.method} "
+                    f"for ingestion and search")
+    finally:
+        db.close()
+
+
+def plan_directory(args):
+    """Estimate the model calls and time ingest-dir would take, without ingesting"""
+    import json
+    import planner
+    from config import config
+    from embedders.host_pool import parse_hosts
+
+    totals = planner.plan_directory(args.directory, workers=args.workers)
+    latencies = planner.load_latencies(args.metrics_file)
+    embed_hosts = len(parse_hosts(config.OLLAMA_HOSTS or config.OLLAMA_HOST))
+    seconds = planner.estimate(totals, latencies, embed_parallelism=embed_hosts)
+
+    source = f"measured in {args.metrics_file}" if args.metrics_file else "defaults; pass --metrics-file"
+    print(planner.format_plan(totals, latencies, seconds, source))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'totals': totals, 'latencies': latencies, 'seconds': seconds}, f, indent=2)
+
+
+def int_list(value: str):
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+def start_metrics(args):
+    """Enable metrics collection if requested on the command line"""
+    from metrics import metrics
+
+    if args.metrics or args.metrics_out:
+        metrics.enabled = True
+    if metrics.enabled and args.metrics_out:
+        metrics.start_exporter(args.metrics_out, args.metrics_interval)
+
+
+def finish_metrics(args):
+    """Print the run summary and flush the exporter"""
+    from metrics import metrics
+
+    if not metrics.enabled:
+        return
+    metrics.stop_exporter()
+    print(metrics.summary_table())
+
+    from embedders.host_pool import pool_stats, format_stats
+    stats = pool_stats()
+    if stats:
+        print(format_stats(stats))
+
+
+def start_profiler(args) -> Optional['Profiler']:
+    """Create and start a profiler if --profile was given"""
+    if not args.profile:
+        return None
+    from profiling import Profiler
+
+    profiler = Profiler(args.profile_dir, top_n=args.profile_top)
+    profiler.start()
+    return profiler
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile each file (cProfile, tracemalloc) and report the slowest files and pages')
+    parser.add_argument('--profile-dir', default='profiles',
+                        help='Parent directory for per-run profile output (default: profiles)')
+    parser.add_argument('--profile-top', type=int, default=10,
+                        help='Number of slowest files and pages to report (default: 10)')
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--metrics', action='store_true',
+                        help='Collect per-stage timings and print a summary at the end')
+    parser.add_argument('--metrics-out',
+                        help='Write metrics to this file (.jsonl appends JSON lines, otherwise Prometheus text)')
+    parser.add_argument('--metrics-interval', type=float, default=30.0,
+                        help='Seconds between metrics file writes (default: 30)')
+
+
 def main():
     parser = argparse.ArgumentParser(description='Multimodal RAG Ingestion Pipeline')
     subparsers = parser.add_subparsers(dest='command', help='Commands')
@@ -61,19 +270,148 @@ def main():
     # Ingest file command
     file_parser = subparsers.add_parser('ingest-file', help='Ingest a single file')
     file_parser.add_argument('file', help='Path to file')
+    add_metrics_arguments(file_parser)
+    add_profile_arguments(file_parser)
 
     # Ingest directory command
     dir_parser = subparsers.add_parser('ingest-dir', help='Ingest all files from directory')
     dir_parser.add_argument('directory', help='Path to directory')
+    add_metrics_arguments(dir_parser)
+    add_profile_arguments(dir_parser)
+
+    # Watch command
+    watch_parser = subparsers.add_parser('watch', help='Continuously ingest changes in a directory')
+    watch_parser.add_argument('directory', help='Path to directory')
+    watch_parser.add_argument('--debounce', type=float, default=2.0,
+                              help='Seconds a file must be quiet before ingesting (default: 2)')
+    watch_parser.add_argument('--batch-size', type=int, default=50,
+                              help='Maximum files per batch (default: 50)')
+    watch_parser.add_argument('--batch-window', type=float, default=5.0,
+                              help='Seconds to coalesce events into a batch (default: 5)')
+    watch_parser.add_argument('--poll-interval', type=float, default=5.0,
+                              help='Seconds between scans when polling (default: 5)')
+    watch_parser.add_argument('--poll', action='store_true',
+                              help='Force polling instead of inotify')
+    add_metrics_arguments(watch_parser)
+
+    # Re-embed command
+    reembed_parser = subparsers.add_parser('reembed', help='Migrate stored embeddings to a new model online')
+    reembed_parser.add_argument('--model', help='New embedding model')
+    reembed_parser.add_argument('--dimension', type=int,
+                                help='New vector dimension (default: probed from the model)')
+    reembed_parser.add_argument('--batch-size', type=int, default=64,
+                                help='Rows embedded per batch (default: 64)')
+    reembed_parser.add_argument('--max-rows-per-second', type=float,
+                                help='Throttle the backfill (default: unthrottled)')
+    reembed_parser.add_argument('--no-swap', action='store_true',
+                                help='Backfill and index, but leave the current embeddings in place')
+    reembed_parser.add_argument('--abort', action='store_true',
+                                help='Abandon the running migration and drop its shadow column')
+    reembed_parser.add_argument('--drop-previous', action='store_true',
+                                help='Drop the embeddings kept from before the last swap')
+
+    # Export / import commands
+    export_parser = subparsers.add_parser('export', help='Export documents and embeddings to Parquet/Arrow')
+    import_parser = subparsers.add_parser('import', help='Bulk load documents and embeddings from Parquet/Arrow')
+    for transfer_parser in (export_parser, import_parser):
+        transfer_parser.add_argument('path', help='Parquet (.parquet) or Arrow IPC (.arrow) file')
+        transfer_parser.add_argument('--format', choices=['parquet', 'arrow'],
+                                     help='File format (default: from extension)')
+        transfer_parser.add_argument('--batch-size', type=int, default=10000,
+                                     help='Rows per batch (default: 10000)')
+    import_parser.add_argument('--allow-model-mismatch', action='store_true',
+                               help="Import even if the file's embedding model differs from the store's")
+
+    # Index evaluation command
+    eval_parser = subparsers.add_parser('eval-index', help='Measure recall@k and latency of vector index settings')
+    eval_parser.add_argument('--queries', type=int, default=200,
+                             help='Stored embeddings sampled as queries (default: 200)')
+    eval_parser.add_argument('--k', type=int, default=10, help='Neighbours per query (default: 10)')
+    eval_parser.add_argument('--target-recall', type=float, default=0.95,
+                             help='Recall the recommendation must reach (default: 0.95)')
+    eval_parser.add_argument('--lists', type=int_list,
+                             help='ivfflat lists to try, comma-separated (default: 100, rows/1000, sqrt(rows))')
+    eval_parser.add_argument('--probes', type=int_list,
+                             help='ivfflat probes to try, comma-separated (default: 1,2,5,10,20,50,100)')
+    eval_parser.add_argument('--no-hnsw', action='store_true', help='Skip hnsw')
+    eval_parser.add_argument('--hnsw-m', type=int, default=16)
+    eval_parser.add_argument('--hnsw-ef-construction', type=int, default=64)
+    eval_parser.add_argument('--ef-search', type=int_list,
+                             help='hnsw ef_search values to try, comma-separated (default: 10,20,40,80,160,320)')
+    eval_parser.add_argument('--reduced-dims', type=int_list,
+                             help='Also evaluate reduced-dimension candidate generation, e.g. 256,384')
+    eval_parser.add_argument('--reduction', choices=['matryoshka', 'pca'], default='matryoshka',
+                             help='How --reduced-dims vectors are derived (default: matryoshka)')
+    eval_parser.add_argument('--oversample', type=int, default=4,
+                             help='Reduced-dimension candidates per result re-ranked with full vectors (default: 4)')
+    eval_parser.add_argument('--pca-sample', type=int, default=20000,
+                             help='Vectors used to fit PCA (default: 20000)')
+    eval_parser.add_argument('--seed', type=int, default=42, help='Seed for the query sample')
+    eval_parser.add_argument('--json', help='Also write the results as JSON to this path')
+
+    # Reduced-dimension command
+    reduce_parser = subparsers.add_parser('reduce', help='Build the reduced-dimension column for faster search')
+    reduce_parser.add_argument('--dimension', type=int, default=256,
+                               help='Reduced vector dimension (default: 256)')
+    reduce_parser.add_argument('--method', choices=['matryoshka', 'pca'], default='matryoshka',
+                               help='Truncate and re-normalize (Matryoshka models), or a PCA projection '
+                                    'fitted on stored embeddings (default: matryoshka)')
+    reduce_parser.add_argument('--sample', type=int, default=20000,
+                               help='Stored embeddings used to fit PCA (default: 20000)')
+    reduce_parser.add_argument('--batch-size', type=int, default=1000,
+                               help='Rows reduced per batch (default: 1000)')
+    reduce_parser.add_argument('--drop', action='store_true',
+                               help='Drop the reduced column and search full vectors again')
+
+    # Plan command
+    plan_parser = subparsers.add_parser('plan', help='Count pages, chunks and model calls ingest-dir would need')
+    plan_parser.add_argument('directory', help='Path to directory')
+    plan_parser.add_argument('--workers', type=int, help='Scanner processes (default: CPU count)')
+    plan_parser.add_argument('--metrics-file',
+                             help='.jsonl written by --metrics-out on an earlier run, for measured per-call latencies')
+    plan_parser.add_argument('--json', help='Also write the plan as JSON to this path')
 
     args = parser.parse_args()
 
     if args.command == 'setup':
         setup_database()
     elif args.command == 'ingest-file':
-        ingest_file(args.file)
+        start_metrics(args)
+        profiler = start_profiler(args)
+        try:
+            ingest_file(args.file, profiler)
+        finally:
+            if profiler:
+                profiler.stop()
+            finish_metrics(args)
     elif args.command == 'ingest-dir':
-        ingest_directory(args.directory)
+        start_metrics(args)
+        profiler = start_profiler(args)
+        try:
+            ingest_directory(args.directory, profiler)
+        finally:
+            if profiler:
+                profiler.stop()
+            finish_metrics(args)
+    elif args.command == 'reembed':
+        reembed_store(args)
+    elif args.command == 'eval-index':
+        evaluate_index(args)
+    elif args.command == 'reduce':
+        reduce_dimensions(args)
+    elif args.command == 'plan':
+        plan_directory(args)
+    elif args.command == 'export':
+        export_store(args.path, args.format, args.batch_size)
+    elif args.command == 'import':
+        import_store(args.path, args.format, args.batch_size, args.allow_model_mismatch)
+    elif args.command == 'watch':
+        start_metrics(args)
+        try:
+            watch_directory(args.directory, args.debounce, args.batch_size,
+                            args.batch_window, args.poll_interval, args.poll)
+        finally:
+            finish_metrics(args)
     else:
         parser.print_help()
         sys.exit(1)
@@ -0,0 +1,271 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+from config import config
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, float("inf"))
+
+_content_type: ContextVar[str] = ContextVar("content_type", default="none")
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        """Estimate the q-th percentile by interpolating within its bucket"""
+        if not self.count:
+            return 0.0
+        target = self.count * q / 100
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= target and bucket_count:
+                low = BUCKETS[i - 1] if i else 0.0
+                high = min(BUCKETS[i], self.max)
+                return low + (high - low) * (target - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+
+class _NullTimer:
+    """Shared no-op context manager returned while metrics are disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    Per-stage timers and counters for ingestion
+
+    Stages are labelled with the content type of the file being ingested,
+    which ingestion sets once per file via content_type(). When disabled,
+    timer() hands back a shared no-op and count() returns immediately.
+
+    Listeners registered with add_listener() get on_start(stage, content_type)
+    and on_stop(stage, content_type, elapsed) calls around every timed stage.
+
+    Unless enabled is given, it comes from METRICS_ENABLED on first use, so
+    importing this module does not read the environment or .env.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None):
+        self._enabled = enabled
+        self.started_at = time.time()
+        self._histograms: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+        self._counters: Dict[Tuple[str, str], float] = defaultdict(float)
+        self._lock = threading.Lock()
+        self._exporter = None
+        self._listeners = []
+
+    @property
+    def enabled(self) -> bool:
+        if self._enabled is None:
+            self._enabled = config.METRICS_ENABLED
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value: bool):
+        self._enabled = value
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    @contextmanager
+    def content_type(self, content_type: str) -> Iterator[None]:
+        """Label everything recorded inside the block with content_type"""
+        token = _content_type.set(content_type)
+        try:
+            yield
+        finally:
+            _content_type.reset(token)
+
+    def timer(self, stage: str, content_type: Optional[str] = None):
+        """Context manager recording the duration of stage"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timed(stage, content_type or _content_type.get())
+
+    @contextmanager
+    def _timed(self, stage: str, content_type: str) -> Iterator[None]:
+        for listener in self._listeners:
+            listener.on_start(stage, content_type)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._histograms[(stage, content_type)].observe(elapsed)
+            for listener in self._listeners:
+                listener.on_stop(stage, content_type, elapsed)
+
+    def instrument(self, stage: str, content_type: str):
+        """
+        Decorator timing each call as stage and labelling everything
+        recorded during the call with content_type
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.content_type(content_type), self._timed(stage, content_type):
+                    self.count('files')
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name: str, value: float = 1, content_type: Optional[str] = None):
+        """Increment a counter, e.g. calls, bytes or chunks"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[(name, content_type or _content_type.get())] += value
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+    def summary_table(self) -> str:
+        """Human-readable table of stage latencies and counters"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        lines = [f"{'stage':<20}{'type':<10}{'calls':>8}{'total s':>10}"
+                 f"{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for (stage, content_type), h in histograms:
+            lines.append(
+                f"{stage:<20}{content_type:<10}{h.count:>8}{h.sum:>10.2f}"
+                f"{h.sum / h.count * 1000:>10.1f}{h.percentile(50) * 1000:>10.1f}"
+                f"{h.percentile(95) * 1000:>10.1f}{h.max * 1000:>10.1f}"
+            )
+        if counters:
+            lines.append("")
+            lines.append(f"{'counter':<20}{'type':<10}{'value':>12}")
+            for (name, content_type), value in counters:
+                lines.append(f"{name:<20}{content_type:<10}{value:>12.0f}")
+        return "\n".join(lines)
+
+    def to_prometheus(self) -> str:
+        """Render all series in Prometheus text exposition format"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        lines = ["# TYPE ingestion_stage_seconds histogram"]
+        for (stage, content_type), h in histograms:
+            labels = f'stage="{stage}",content_type="{content_type}"'
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, h.counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'ingestion_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"ingestion_stage_seconds_sum{{{labels}}} {h.sum}")
+            lines.append(f"ingestion_stage_seconds_count{{{labels}}} {h.count}")
+
+        names = sorted({name for (name, _), _ in counters})
+        for name in names:
+            lines.append(f"# TYPE ingestion_{name}_total counter")
+            for (counter, content_type), value in counters:
+                if counter == name:
+                    lines.append(f'ingestion_{name}_total{{content_type="{content_type}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def to_json_lines(self) -> List[str]:
+        """One JSON object per series, stamped with the current time"""
+        now = time.time()
+        with self._lock:
+            records = [
+                {"ts": now, "kind": "histogram", "stage": stage, "content_type": content_type,
+                 "count": h.count, "sum": h.sum, "max": h.max,
+                 "p50": h.percentile(50), "p95": h.percentile(95)}
+                for (stage, content_type), h in sorted(self._histograms.items())
+            ]
+            records += [
+                {"ts": now, "kind": "counter", "name": name,
+                 "content_type": content_type, "value": value}
+                for (name, content_type), value in sorted(self._counters.items())
+            ]
+        return [json.dumps(record) for record in records]
+
+    def write(self, path: str):
+        """
+        Write metrics to path
+
+        Files ending in .jsonl get a snapshot appended; anything else is
+        atomically replaced with Prometheus text format, suitable for the
+        node_exporter textfile collector.
+        """
+        if path.endswith(".jsonl"):
+            with open(path, "a") as f:
+                for line in self.to_json_lines():
+                    f.write(line + "\n")
+        else:
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "w") as f:
+                f.write(self.to_prometheus())
+            os.replace(temp_path, path)
+
+    def start_exporter(self, path: str, interval: float = 30.0):
+        """Write metrics to path every interval seconds until stop_exporter()"""
+        stop = threading.Event()
+
+        def export():
+            while not stop.wait(interval):
+                try:
+                    self.write(path)
+                except OSError as e:
+                    logger.warning(f"Failed to write metrics to {path}: {e}")
+
+        thread = threading.Thread(target=export, daemon=True)
+        thread.start()
+        self._exporter = (stop, thread, path)
+
+    def stop_exporter(self):
+        """Stop the periodic exporter and write a final snapshot"""
+        if not self._exporter:
+            return
+        stop, thread, path = self._exporter
+        stop.set()
+        thread.join()
+        self.write(path)
+        self._exporter = None
+
+
+metrics = Metrics()
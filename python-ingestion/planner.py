@@ -0,0 +1,171 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, Optional
+from config import config
+import json
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Per-call seconds used when no metrics file is given
+DEFAULT_LATENCIES = {
+    'embed': 0.05,
+    'describe_image': 5.0,
+    'insert_document': 0.003,
+    'extract_pages': 0.0,
+}
+
+COUNTS = ('files', 'pdfs', 'images', 'texts', 'pages', 'chunks', 'vision_calls',
+          'embed_calls', 'rows', 'bytes', 'errors')
+
+
+def scan_file(file_path: str) -> Dict[str, int]:
+    """
+    Count what ingesting one file would cost, without decoding images or calling models
+
+    Uses the same processors, image filter and chunking parameters as
+    MultimodalIngestion.
+    """
+    from processors import PDFProcessor, ImageProcessor, TextProcessor
+
+    counts = dict.fromkeys(COUNTS, 0)
+    counts['files'] = 1
+    ext = os.path.splitext(file_path)[1].lower()
+    try:
+        counts['bytes'] = os.path.getsize(file_path)
+        if ext == '.pdf':
+            counts['pdfs'] = 1
+            for page in PDFProcessor().scan_pages(file_path):
+                counts['pages'] += 1
+                chunks = TextProcessor.count_chunks(len(TextProcessor.clean_text(page['text'])))
+                counts['chunks'] += chunks
+                counts['vision_calls'] += page['images']
+                # Each image description is embedded and stored as its own row
+                counts['embed_calls'] += chunks + page['images']
+                counts['rows'] += chunks + page['images']
+        elif ext in ImageProcessor.SUPPORTED_FORMATS:
+            counts['images'] = 1
+            counts['vision_calls'] = counts['embed_calls'] = counts['rows'] = 1
+        elif ext == '.txt':
+            counts['texts'] = 1
+            with open(file_path, 'r', encoding='utf-8') as f:
+                chunks = TextProcessor.count_chunks(len(TextProcessor.clean_text(f.read())))
+            counts['chunks'] = counts['embed_calls'] = counts['rows'] = chunks
+    except Exception as e:
+        logger.warning(f"Failed to scan {file_path}: {e}")
+        counts['errors'] = 1
+    return counts
+
+
+def iter_supported_files(directory_path: str) -> Iterator[str]:
+    """Files under directory_path that ingest-dir would ingest"""
+    from ingestion import MultimodalIngestion
+
+    for root, dirs, files in os.walk(directory_path):
+        for file in files:
+            file_path = os.path.join(root, file)
+            if MultimodalIngestion.is_supported(file_path):
+                yield file_path
+
+
+def plan_directory(directory_path: str, workers: Optional[int] = None,
+                   chunksize: int = 64) -> Dict[str, int]:
+    """
+    Totals of scan_file over every supported file, scanned in parallel processes
+
+    Args:
+        directory_path: Tree to plan
+        workers: Scanner processes (default: CPU count)
+        chunksize: Files handed to a worker at a time
+    """
+    totals = dict.fromkeys(COUNTS, 0)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for counts in executor.map(scan_file, iter_supported_files(directory_path), chunksize=chunksize):
+            for name, value in counts.items():
+                totals[name] += value
+            if totals['files'] % 10000 == 0:
+                logger.info(f"Scanned {totals['files']} files")
+
+    logger.info(f"Scanned {totals['files']} files in {time.perf_counter() - start:.1f}s")
+    return totals
+
+
+def load_latencies(metrics_path: Optional[str] = None) -> Dict[str, float]:
+    """
+    Mean seconds per call from the last snapshot in a --metrics-out .jsonl file
+
+    Stages the file has no samples for keep their DEFAULT_LATENCIES value.
+    """
+    latencies = dict(DEFAULT_LATENCIES)
+    if not metrics_path:
+        return latencies
+
+    snapshot = {}
+    with open(metrics_path) as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get('kind') == 'histogram' and record['stage'] in latencies:
+                # Later lines are later snapshots of the same cumulative series
+                snapshot[(record['stage'], record['content_type'])] = record
+
+    for stage in latencies:
+        series = [r for (name, _), r in snapshot.items() if name == stage]
+        count = sum(r['count'] for r in series)
+        if count:
+            latencies[stage] = sum(r['sum'] for r in series) / count
+    return latencies
+
+
+def estimate(totals: Dict[str, int], latencies: Dict[str, float],
+             embed_parallelism: int = 1) -> Dict[str, float]:
+    """
+    Estimated seconds per stage and in total
+
+    Args:
+        totals: Counts from plan_directory
+        latencies: Seconds per call from load_latencies
+        embed_parallelism: Hosts embedding calls are spread over
+    """
+    seconds = {
+        'extract_pages': totals['pdfs'] * latencies['extract_pages'],
+        'describe_image': totals['vision_calls'] * latencies['describe_image'],
+        'embed': totals['embed_calls'] * latencies['embed'] / max(embed_parallelism, 1),
+        'insert_document': totals['rows'] * latencies['insert_document'],
+    }
+    seconds['total'] = sum(seconds.values())
+    return seconds
+
+
+def _duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}h {minutes:02d}m {secs:02d}s" if hours else f"{minutes}m {secs:02d}s"
+
+
+def format_plan(totals: Dict[str, int], latencies: Dict[str, float],
+                seconds: Dict[str, float], latency_source: str) -> str:
+    """Counts, model calls and the time estimate as text"""
+    lines = [
+        f"Files:          {totals['files']} ({totals['pdfs']} PDF, {totals['images']} image, "
+        f"{totals['texts']} text), {totals['bytes'] / 1e9:.2f} GB, {totals['errors']} unreadable",
+        f"PDF pages:      {totals['pages']}",
+        f"Text chunks:    {totals['chunks']}",
+        f"Vision calls:   {totals['vision_calls']} ({config.VISION_MODEL})",
+        f"Embed calls:    {totals['embed_calls']} ({config.EMBEDDING_MODEL})",
+        f"Rows inserted:  {totals['rows']}",
+        "",
+        f"Latencies ({latency_source}):",
+    ]
+    for stage, value in latencies.items():
+        lines.append(f"  {stage:<16}{value * 1000:>10.1f} ms/call")
+    lines.append("")
+    lines.append("Estimated time:")
+    for stage, value in seconds.items():
+        if stage != 'total':
+            lines.append(f"  {stage:<16}{_duration(value):>14}")
+    lines.append(f"  {'total':<16}{_duration(seconds['total']):>14}")
+    return '\n'.join(lines)
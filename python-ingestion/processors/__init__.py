@@ -1,5 +1,17 @@
-from .text_processor import TextProcessor
-from .image_processor import ImageProcessor
-from .pdf_processor import PDFProcessor
+import importlib
 
-__all__ = ['TextProcessor', 'ImageProcessor', 'PDFProcessor']
\ No newline at end of file
+# Submodules are imported on first attribute access, so e.g. TextProcessor
+# does not pull in PyMuPDF and PIL
+_MODULES = {
+    'TextProcessor': '.text_processor',
+    'ImageProcessor': '.image_processor',
+    'PDFProcessor': '.pdf_processor',
+}
+
+__all__ = ['TextProcessor', 'ImageProcessor', 'PDFProcessor']
+
+
+def __getattr__(name):
+    if name in _MODULES:
+        return getattr(importlib.import_module(_MODULES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,3 @@
-from PIL import Image
 import os
 
 
@@ -14,6 +13,8 @@ class ImageProcessor:
     @staticmethod
     def get_image_metadata(file_path: str) -> dict:
         """Extract basic image metadata"""
+        from PIL import Image
+
         with Image.open(file_path) as img:
             return {
                 'format': img.format,
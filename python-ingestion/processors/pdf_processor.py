@@ -5,6 +5,7 @@ import io
 import os
 import tempfile
 import logging
+from metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +44,16 @@ class PDFProcessor:
         - tables: List of detected table regions (basic detection)
         - metadata: PDF metadata
         """
+        with metrics.timer('extract_pages', 'pdf'):
+            pages = self._extract_pages(pdf_path)
+
+        metrics.count('pdf_bytes', os.path.getsize(pdf_path), 'pdf')
+        metrics.count('pages', len(pages), 'pdf')
+        metrics.count('images_extracted', sum(len(p['images']) for p in pages), 'pdf')
+        logger.info(f"Extracted {len(pages)} pages from {pdf_path}")
+        return pages
+
+    def _extract_pages(self, pdf_path: str) -> List[Dict]:
         doc = fitz.open(pdf_path)
         pages = []
 
@@ -68,7 +79,37 @@ class PDFProcessor:
             pages.append(page_data)
 
         doc.close()
-        logger.info(f"Extracted {len(pages)} pages from {pdf_path}")
+        return pages
+
+    def scan_pages(self, pdf_path: str) -> List[Dict]:
+        """
+        Cheap per-page inventory for planning, without decoding any image
+
+        Returns page dictionaries with page_number, text and images (the
+        number of images extract_pages would keep). The min_image_size
+        filter is applied to each image's stored stream length, which
+        matches the extracted size for JPEG and approximates it otherwise.
+        """
+        doc = fitz.open(pdf_path)
+        pages = []
+
+        for page_num, page in enumerate(doc):
+            images = 0
+            if self.extract_images:
+                for img_info in page.get_images():
+                    xref = img_info[0]
+                    kind, length = doc.xref_get_key(xref, "Length")
+                    size = int(length) if kind == 'int' else len(doc.xref_stream_raw(xref) or b'')
+                    if size >= self.min_image_size:
+                        images += 1
+
+            pages.append({
+                'page_number': page_num + 1,
+                'text': page.get_text(),
+                'images': images
+            })
+
+        doc.close()
         return pages
 
     def _extract_page_images(self, page: fitz.Page, page_num: int, pdf_path: str) -> List[Dict]:
@@ -88,15 +129,17 @@ class PDFProcessor:
                 # Create a temporary file for the image
                 image_bytes = base_image["image"]
                 image_ext = base_image["ext"]
+                metrics.count('image_bytes', len(image_bytes), 'pdf')
 
-                # Convert to PIL Image for consistency
-                pil_image = Image.open(io.BytesIO(image_bytes))
+                with metrics.timer('decode_image', 'pdf'):
+                    # Convert to PIL Image for consistency
+                    pil_image = Image.open(io.BytesIO(image_bytes))
 
-                # Save to temporary file
-                temp_dir = tempfile.gettempdir()
-                temp_filename = f"pdf_img_p{page_num}_i{img_index}.{image_ext}"
-                temp_path = os.path.join(temp_dir, temp_filename)
-                pil_image.save(temp_path)
+                    # Save to temporary file
+                    temp_dir = tempfile.gettempdir()
+                    temp_filename = f"pdf_img_p{page_num}_i{img_index}.{image_ext}"
+                    temp_path = os.path.join(temp_dir, temp_filename)
+                    pil_image.save(temp_path)
 
                 images.append({
                     'image_path': temp_path,
@@ -16,6 +16,12 @@ class TextProcessor:
 
         return chunks
 
+    @staticmethod
+    def count_chunks(text_length: int, chunk_size: int = 1000, overlap: int = 200) -> int:
+        """Number of chunks chunk_text would produce for text of this length"""
+        step = chunk_size - overlap
+        return -(-text_length // step) if text_length > 0 else 0
+
     @staticmethod
     def clean_text(text: str) -> str:
         """Basic text cleaning"""
@@ -0,0 +1,210 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+from metrics import metrics
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import time
+import tracemalloc
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Stages whose peak memory is tracked with tracemalloc
+MEMORY_STAGES = {'extract_pages', 'decode_image'}
+
+# Stages that wrap others and are reported as totals rather than breakdown
+SCOPE_STAGES = {'ingest_file', 'ingest_page'}
+
+
+class Profiler:
+    """
+    Per-file profiling for an ingestion run
+
+    Each file is run under cProfile, peak memory around extract_pages and
+    PIL image decoding is tracked with tracemalloc, and metrics stage timings
+    are attributed to the file and page being processed. Everything is
+    written to a fresh per-run directory.
+    """
+
+    def __init__(self, output_dir: str = 'profiles', top_n: int = 10):
+        """
+        Initialize profiler
+
+        Args:
+            output_dir: Parent directory for per-run profile directories
+            top_n: Number of slowest files and pages to report
+        """
+        self.run_dir = os.path.join(output_dir, time.strftime('%Y%m%d-%H%M%S'))
+        self.top_n = top_n
+        self.files: List[Dict] = []
+        self._current = None
+        self._page_stages = None
+        self._memory_stack = []
+        self._profile = None
+        self._snapshot = None
+        self._overhead = 0.0
+        self._metrics_was_enabled = metrics.enabled
+
+    def start(self):
+        os.makedirs(os.path.join(self.run_dir, 'files'), exist_ok=True)
+        tracemalloc.start()
+        metrics.enabled = True
+        metrics.add_listener(self)
+        logger.info(f"Profiling to {self.run_dir}")
+
+    def stop(self):
+        """Stop tracing and write the run report"""
+        metrics.remove_listener(self)
+        metrics.enabled = self._metrics_was_enabled
+        tracemalloc.stop()
+
+        report = self.report()
+        with open(os.path.join(self.run_dir, 'report.txt'), 'w') as f:
+            f.write(report)
+        with open(os.path.join(self.run_dir, 'report.json'), 'w') as f:
+            json.dump(self.files, f, indent=2)
+        print(report)
+        logger.info(f"Profile written to {self.run_dir}")
+
+    def _file_prefix(self, path: str) -> str:
+        name = re.sub(r'[^A-Za-z0-9._-]', '_', os.path.basename(path))
+        return os.path.join(self.run_dir, 'files', f"{len(self.files):05d}-{name}")
+
+    @contextmanager
+    def file(self, path: str) -> Iterator[None]:
+        """Profile ingestion of one file"""
+        record = {
+            'path': path,
+            'size_bytes': os.path.getsize(path) if os.path.exists(path) else 0,
+            'elapsed_s': 0.0,
+            'stages': defaultdict(float),
+            'pages': [],
+            'memory_peak_bytes': {},
+        }
+        self._current = record
+        self._overhead = 0.0
+        prefix = self._file_prefix(path)
+
+        profile = self._profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            # Snapshot time is the profiler's, not the file's
+            record['elapsed_s'] = time.perf_counter() - start - self._overhead
+            record['stages'] = dict(record['stages'])
+            self._current = None
+            self._profile = None
+            self.files.append(record)
+
+            if self._snapshot is not None:
+                self._write_memory_snapshot(self._snapshot, f"{prefix}.memory.txt")
+                self._snapshot = None
+
+            profile.dump_stats(f"{prefix}.prof")
+            stream = io.StringIO()
+            pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(40)
+            with open(f"{prefix}.txt", 'w') as f:
+                f.write(stream.getvalue())
+
+    def on_start(self, stage: str, content_type: str):
+        if self._current is None:
+            return
+        if stage == 'ingest_page':
+            self._page_stages = defaultdict(float)
+        if stage in MEMORY_STAGES:
+            # reset_peak() is global, so fold the enclosing stage's peak so far into it first
+            current, peak = tracemalloc.get_traced_memory()
+            if self._memory_stack:
+                self._memory_stack[-1][2] = max(self._memory_stack[-1][2], peak)
+            tracemalloc.reset_peak()
+            self._memory_stack.append([stage, current, current])
+
+    def on_stop(self, stage: str, content_type: str, elapsed: float):
+        record = self._current
+        if record is None:
+            return
+
+        if stage in MEMORY_STAGES and self._memory_stack:
+            _, baseline, peak_so_far = self._memory_stack.pop()
+            peak = max(peak_so_far, tracemalloc.get_traced_memory()[1])
+            if self._memory_stack:
+                self._memory_stack[-1][2] = max(self._memory_stack[-1][2], peak)
+            peaks = record['memory_peak_bytes']
+            peaks[stage] = max(peaks.get(stage, 0), peak - baseline)
+            if stage == 'extract_pages':
+                self._take_memory_snapshot()
+
+        if stage == 'ingest_page':
+            record['pages'].append({
+                'page_number': len(record['pages']) + 1,
+                'elapsed_s': elapsed,
+                'stages': dict(self._page_stages or {}),
+            })
+            self._page_stages = None
+        elif stage not in SCOPE_STAGES:
+            record['stages'][stage] += elapsed
+            if self._page_stages is not None:
+                self._page_stages[stage] += elapsed
+
+    def _take_memory_snapshot(self):
+        """
+        Snapshot live allocations right after extract_pages
+
+        Only the raw snapshot is taken here, outside cProfile and the file's
+        elapsed time; it is summarized once the file is done.
+        """
+        paused = time.perf_counter()
+        self._profile.disable()
+        self._snapshot = tracemalloc.take_snapshot()
+        self._profile.enable()
+        self._overhead += time.perf_counter() - paused
+
+    @staticmethod
+    def _write_memory_snapshot(snapshot: tracemalloc.Snapshot, path: str):
+        """Write the largest allocation sites, leaving out tracemalloc's own"""
+        stats = [stat for stat in snapshot.statistics('lineno')
+                 if stat.traceback[0].filename != tracemalloc.__file__]
+        with open(path, 'w') as f:
+            for stat in stats[:25]:
+                f.write(f"{stat}\n")
+
+    @staticmethod
+    def _breakdown(stages: Dict[str, float]) -> str:
+        parts = sorted(stages.items(), key=lambda item: item[1], reverse=True)
+        return ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in parts)
+
+    def report(self) -> str:
+        """Slowest files and pages with their stage breakdown"""
+        lines = [f"Profiled {len(self.files)} files, output in {self.run_dir}", ""]
+
+        lines.append(f"Slowest {self.top_n} files:")
+        for record in sorted(self.files, key=lambda r: r['elapsed_s'], reverse=True)[:self.top_n]:
+            memory = ", ".join(f"{stage} {peak / 1024 / 1024:.1f} MiB"
+                               for stage, peak in record['memory_peak_bytes'].items())
+            lines.append(f"  {record['elapsed_s']:8.2f}s  {record['path']} "
+                         f"({record['size_bytes'] / 1024:.0f} KiB)")
+            lines.append(f"             stages: {self._breakdown(record['stages'])}")
+            if memory:
+                lines.append(f"             peak memory: {memory}")
+
+        pages = [
+            (page, record['path'])
+            for record in self.files
+            for page in record['pages']
+        ]
+        if pages:
+            lines.append("")
+            lines.append(f"Slowest {self.top_n} pages:")
+            for page, path in sorted(pages, key=lambda p: p[0]['elapsed_s'], reverse=True)[:self.top_n]:
+                lines.append(f"  {page['elapsed_s']:8.2f}s  {path} page {page['page_number']}")
+                lines.append(f"             stages: {self._breakdown(page['stages'])}")
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,214 @@
+import numpy as np
+from psycopg2.extras import execute_values
+from typing import Optional
+from database import REDUCED_COLUMN, vector_literal, parse_vector, vector_index_sql
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class MatryoshkaReducer:
+    """Keeps the leading dimensions and re-normalizes (for Matryoshka-trained models)"""
+
+    method = 'matryoshka'
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    def reduce(self, vectors) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        return _normalize(vectors[:, :self.dimension])
+
+
+class PCAReducer:
+    """Projects unit vectors onto principal components fitted from stored embeddings"""
+
+    method = 'pca'
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray):
+        """
+        Initialize reducer
+
+        Args:
+            mean: (source_dimension,) mean of the normalized sample
+            components: (dimension, source_dimension) projection matrix
+        """
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.dimension = self.components.shape[0]
+        self.projection_id = None
+
+    @classmethod
+    def fit(cls, sample, dimension: int) -> 'PCAReducer':
+        """Fit the top `dimension` components of a (rows, source_dimension) sample"""
+        sample = _normalize(np.asarray(sample, dtype=np.float32))
+        if len(sample) < dimension:
+            raise ValueError(f"PCA to {dimension} dimensions needs at least {dimension} "
+                             f"sample vectors, got {len(sample)}")
+        mean = sample.mean(axis=0)
+        _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+        return cls(mean, vt[:dimension])
+
+    def reduce(self, vectors) -> np.ndarray:
+        vectors = _normalize(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        return _normalize((vectors - self.mean) @ self.components.T)
+
+
+def create_reducer(method: str, dimension: int, sample=None):
+    """Matryoshka reducer, or a PCA reducer fitted on sample"""
+    if method == 'pca':
+        if sample is None:
+            raise ValueError("PCA needs a sample of embeddings to fit")
+        return PCAReducer.fit(sample, dimension)
+    if method == 'matryoshka':
+        return MatryoshkaReducer(dimension)
+    raise ValueError(f"Unknown reduction method: {method}")
+
+
+def _ensure_projection_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS embedding_projections (
+            id SERIAL PRIMARY KEY,
+            method VARCHAR(20) NOT NULL,
+            dimension INTEGER NOT NULL,
+            source_dimension INTEGER NOT NULL,
+            mean REAL[] NOT NULL,
+            components REAL[] NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+
+def save_projection(db, reducer: PCAReducer) -> int:
+    """Store a fitted PCA projection, so every reader projects the same way"""
+    with db.conn.cursor() as cur:
+        _ensure_projection_table(cur)
+        cur.execute("""
+            INSERT INTO embedding_projections (method, dimension, source_dimension, mean, components)
+            VALUES (%s, %s, %s, %s, %s)
+            RETURNING id
+        """, (reducer.method, reducer.dimension, reducer.components.shape[1],
+              reducer.mean.tolist(), reducer.components.ravel().tolist()))
+        reducer.projection_id = cur.fetchone()[0]
+        db.conn.commit()
+    return reducer.projection_id
+
+
+def sample_embeddings(db, size: int) -> np.ndarray:
+    """Random sample of stored embeddings"""
+    with db.conn.cursor() as cur:
+        cur.execute("""
+            SELECT embedding::text FROM documents
+            WHERE embedding IS NOT NULL
+            ORDER BY random()
+            LIMIT %s
+        """, (size,))
+        rows = cur.fetchall()
+    db.conn.commit()
+    return np.vstack([parse_vector(row[0]) for row in rows]) if rows else np.empty((0, 0), np.float32)
+
+
+def _column_tag(reducer) -> str:
+    """Column comment recording how the reduced vectors were derived"""
+    if reducer.method == 'pca':
+        return f"pca:{reducer.projection_id}"
+    return reducer.method
+
+
+def load_reducer(db, state: Optional[tuple] = None):
+    """
+    Reducer that documents.embedding_reduced was built with, None if there is no such column
+
+    Args:
+        db: Database
+        state: (dimension, column comment) from Database.reduced_column_state(),
+            read if not given
+    """
+    state = state if state is not None else db.reduced_column_state()
+    if state is None:
+        return None
+    dimension, tag = state
+    method, _, projection_id = (tag or '').partition(':')
+
+    if method == 'matryoshka':
+        return MatryoshkaReducer(dimension)
+    if method != 'pca' or not projection_id:
+        logger.warning(f"documents.{REDUCED_COLUMN} has an unknown reduction ({tag!r}); "
+                       f"rebuild it with `main.py reduce`")
+        return None
+
+    with db.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT mean, components FROM embedding_projections WHERE id = %s",
+                    (int(projection_id),))
+        projection = cur.fetchone()
+    if projection is None:
+        logger.warning(f"PCA projection {projection_id} is missing; rebuild with `main.py reduce`")
+        return None
+    mean = np.asarray(projection[0], dtype=np.float32)
+    reducer = PCAReducer(mean, np.asarray(projection[1], dtype=np.float32).reshape(dimension, len(mean)))
+    reducer.projection_id = int(projection_id)
+    return reducer
+
+
+def backfill(db, reducer, batch_size: int = 1000) -> int:
+    """
+    (Re)build documents.embedding_reduced from the full embeddings and index it
+
+    Returns the number of rows reduced. Writers pick the new column up on
+    their next insert and write reduced vectors for the rows they add.
+    """
+    with db.conn.cursor() as cur:
+        cur.execute(f"DROP INDEX IF EXISTS documents_{REDUCED_COLUMN}_idx;")
+        cur.execute(f"ALTER TABLE documents DROP COLUMN IF EXISTS {REDUCED_COLUMN};")
+        cur.execute(f"ALTER TABLE documents ADD COLUMN {REDUCED_COLUMN} vector({reducer.dimension});")
+        cur.execute(f"COMMENT ON COLUMN documents.{REDUCED_COLUMN} IS %s;", (_column_tag(reducer),))
+        db.conn.commit()
+
+    last_id = 0
+    total = 0
+    while True:
+        with db.conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, embedding::text FROM documents
+                WHERE id > %s AND embedding IS NOT NULL
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, batch_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+            reduced = reducer.reduce(np.vstack([parse_vector(text) for _, text in rows]))
+            execute_values(cur, f"""
+                UPDATE documents AS d
+                SET {REDUCED_COLUMN} = v.embedding::vector
+                FROM (VALUES %s) AS v(id, embedding)
+                WHERE d.id = v.id
+            """, [(row_id, vector_literal(vector)) for (row_id, _), vector in zip(rows, reduced)])
+            db.conn.commit()
+        last_id = rows[-1][0]
+        total += len(rows)
+        logger.info(f"Reduced {total} rows to {reducer.dimension} dimensions")
+
+    with db.conn.cursor() as cur:
+        cur.execute(vector_index_sql('documents', REDUCED_COLUMN))
+        # Rows without a reduced vector are not in that index; searches add them from this one
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS documents_{REDUCED_COLUMN}_missing_idx
+            ON documents (id) WHERE {REDUCED_COLUMN} IS NULL;
+        """)
+        cur.execute("ANALYZE documents;")
+        db.conn.commit()
+    logger.info(f"Built index documents_{REDUCED_COLUMN}_idx")
+    return total
+
+
+def drop_reduced(db):
+    """Remove the reduced column; searches go back to the full vectors"""
+    with db.conn.cursor() as cur:
+        cur.execute(f"ALTER TABLE documents DROP COLUMN IF EXISTS {REDUCED_COLUMN};")
+        db.conn.commit()
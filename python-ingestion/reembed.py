@@ -0,0 +1,239 @@
+from psycopg2.extras import execute_values
+from typing import Optional
+from database import MIGRATIONS_TABLE_SQL
+from reduction import REDUCED_COLUMN
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SHADOW_COLUMN = 'embedding_next'
+PREVIOUS_COLUMN = 'embedding_prev'
+
+
+class ReembedMigration:
+    """
+    Online migration of documents.embedding to a new embedding model
+
+    The new vectors are backfilled from the stored content into a shadow
+    column in resumable, throttled batches, indexed concurrently, and then
+    swapped in by renaming columns and indexes in one short transaction, so
+    search_similar (and the .NET API) keep querying `embedding` throughout.
+    Progress is recorded in the embedding_migrations table.
+
+    Writers stay on the old model during the backfill: their rows get a NULL
+    shadow vector and are embedded by the swap's catch-up. The swap records
+    the new model; from then on Database refuses inserts and searches that
+    pass a different embedding_model, and MultimodalIngestion switches to it.
+    """
+
+    def __init__(self, db, embedder, batch_size: int = 64,
+                 max_rows_per_second: Optional[float] = None):
+        """
+        Initialize migration
+
+        Args:
+            db: Database to migrate
+            embedder: TextEmbedder for the new model
+            batch_size: Rows embedded and written per batch
+            max_rows_per_second: Throttle for the backfill, None for no limit
+        """
+        self.db = db
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.max_rows_per_second = max_rows_per_second
+        self._ensure_state_table()
+
+    def _ensure_state_table(self):
+        with self.db.conn.cursor() as cur:
+            cur.execute(MIGRATIONS_TABLE_SQL)
+            self.db.conn.commit()
+
+    def active(self) -> Optional[dict]:
+        """The unfinished migration, if any"""
+        with self.db.conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, model, dimension, status, last_id, rows_done
+                FROM embedding_migrations
+                WHERE status IN ('backfilling', 'indexing')
+                ORDER BY id DESC
+                LIMIT 1
+            """)
+            row = cur.fetchone()
+        self.db.conn.commit()
+        if row is None:
+            return None
+        return dict(zip(('id', 'model', 'dimension', 'status', 'last_id', 'rows_done'), row))
+
+    def _start(self, dimension: int) -> dict:
+        with self.db.conn.cursor() as cur:
+            cur.execute(f"ALTER TABLE documents DROP COLUMN IF EXISTS {SHADOW_COLUMN};")
+            cur.execute(f"ALTER TABLE documents ADD COLUMN {SHADOW_COLUMN} vector({dimension});")
+            cur.execute("""
+                INSERT INTO embedding_migrations (model, dimension, status)
+                VALUES (%s, %s, 'backfilling')
+                RETURNING id
+            """, (self.embedder.model_name, dimension))
+            migration_id = cur.fetchone()[0]
+            self.db.conn.commit()
+        logger.info(f"Started migration {migration_id} to {self.embedder.model_name} ({dimension} dimensions)")
+        return {'id': migration_id, 'model': self.embedder.model_name, 'dimension': dimension,
+                'status': 'backfilling', 'last_id': 0, 'rows_done': 0}
+
+    def _set_status(self, migration: dict, status: str):
+        with self.db.conn.cursor() as cur:
+            cur.execute("""
+                UPDATE embedding_migrations
+                SET status = %s,
+                    finished_at = CASE WHEN %s IN ('swapped', 'aborted') THEN CURRENT_TIMESTAMP END
+                WHERE id = %s
+            """, (status, status, migration['id']))
+            self.db.conn.commit()
+        migration['status'] = status
+
+    def _embed_rows(self, cur, rows) -> int:
+        """Embed (id, content) rows and write them to the shadow column, without committing"""
+        embeddings = self.embedder.embed_batch([content or ' ' for _, content in rows])
+        execute_values(cur, f"""
+            UPDATE documents AS d
+            SET {SHADOW_COLUMN} = v.embedding::vector
+            FROM (VALUES %s) AS v(id, embedding)
+            WHERE d.id = v.id
+        """, [(row_id, embedding.tolist()) for (row_id, _), embedding in zip(rows, embeddings)],
+            template='(%s, %s::real[])')
+        return len(rows)
+
+    def backfill(self, migration: dict):
+        """Embed every row without a shadow vector, resuming after last_id"""
+        last_id = migration['last_id']
+        rows_done = migration['rows_done']
+
+        while True:
+            started = time.monotonic()
+            with self.db.conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT id, content
+                    FROM documents
+                    WHERE id > %s AND {SHADOW_COLUMN} IS NULL
+                    ORDER BY id
+                    LIMIT %s
+                """, (last_id, self.batch_size))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+
+                rows_done += self._embed_rows(cur, rows)
+                last_id = rows[-1][0]
+                # Progress commits with the batch, so a restart resumes here
+                cur.execute("""
+                    UPDATE embedding_migrations SET last_id = %s, rows_done = %s WHERE id = %s
+                """, (last_id, rows_done, migration['id']))
+                self.db.conn.commit()
+
+            logger.info(f"Re-embedded {rows_done} rows (last id {last_id})")
+            if self.max_rows_per_second:
+                min_duration = len(rows) / self.max_rows_per_second
+                time.sleep(max(0.0, min_duration - (time.monotonic() - started)))
+
+        migration['last_id'] = last_id
+        migration['rows_done'] = rows_done
+
+    def build_index(self):
+        """Build the shadow column's index without blocking writes"""
+        index = f"documents_{SHADOW_COLUMN}_idx"
+        self.db.conn.commit()
+        self.db.conn.autocommit = True
+        try:
+            with self.db.conn.cursor() as cur:
+                # A failed concurrent build leaves an invalid index behind
+                cur.execute("""
+                    SELECT NOT i.indisvalid
+                    FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+                    WHERE c.relname = %s
+                """, (index,))
+                row = cur.fetchone()
+                if row and row[0]:
+                    cur.execute(f"DROP INDEX CONCURRENTLY {index};")
+                self.db._create_vector_index(cur, SHADOW_COLUMN, concurrently=True)
+        finally:
+            self.db.conn.autocommit = False
+        logger.info(f"Built index {index}")
+
+    def swap(self, migration: dict):
+        """Catch up on rows written meanwhile, then swap the shadow column in atomically"""
+        with self.db.conn.cursor() as cur:
+            # Block writers during the catch-up; the renames then hold a brief exclusive lock
+            cur.execute("LOCK TABLE documents IN SHARE ROW EXCLUSIVE MODE;")
+            while True:
+                cur.execute(f"""
+                    SELECT id, content FROM documents
+                    WHERE {SHADOW_COLUMN} IS NULL
+                    ORDER BY id
+                    LIMIT %s
+                """, (self.batch_size,))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                migration['rows_done'] += self._embed_rows(cur, rows)
+
+            cur.execute(f"ALTER TABLE documents DROP COLUMN IF EXISTS {PREVIOUS_COLUMN};")
+            cur.execute(f"ALTER TABLE documents RENAME COLUMN embedding TO {PREVIOUS_COLUMN};")
+            cur.execute(f"ALTER TABLE documents RENAME COLUMN {SHADOW_COLUMN} TO embedding;")
+            cur.execute(f"ALTER INDEX IF EXISTS documents_embedding_idx RENAME TO documents_{PREVIOUS_COLUMN}_idx;")
+            cur.execute(f"ALTER INDEX documents_{SHADOW_COLUMN}_idx RENAME TO documents_embedding_idx;")
+            # Reduced vectors were derived from the old model's embeddings
+            cur.execute(f"ALTER TABLE documents DROP COLUMN IF EXISTS {REDUCED_COLUMN};")
+            cur.execute("""
+                UPDATE embedding_migrations
+                SET status = 'swapped', rows_done = %s, finished_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (migration['rows_done'], migration['id']))
+            self.db.conn.commit()
+        migration['status'] = 'swapped'
+
+        with self.db.conn.cursor() as cur:
+            cur.execute("ANALYZE documents;")
+            self.db.conn.commit()
+        logger.info(f"Swapped in {migration['model']} embeddings; previous vectors kept in {PREVIOUS_COLUMN}")
+        if self.db.reducer:
+            logger.warning("Reduced vectors were dropped with the old model; re-run `main.py reduce`")
+
+    def run(self, dimension: Optional[int] = None, swap: bool = True) -> dict:
+        """Start or resume the migration to the embedder's model"""
+        migration = self.active()
+        if migration and migration['model'] != self.embedder.model_name:
+            raise RuntimeError(f"Migration {migration['id']} to {migration['model']} is in progress; "
+                               f"finish it or run reembed --abort first")
+
+        if migration is None:
+            if dimension is None:
+                dimension = len(self.embedder.embed_batch(['dimension probe'])[0])
+            migration = self._start(dimension)
+        else:
+            logger.info(f"Resuming migration {migration['id']} after id {migration['last_id']} "
+                        f"({migration['rows_done']} rows done)")
+
+        self.backfill(migration)
+        self._set_status(migration, 'indexing')
+        self.build_index()
+
+        if swap:
+            self.swap(migration)
+        return migration
+
+    def abort(self):
+        """Drop the shadow column and mark the active migration aborted"""
+        migration = self.active()
+        with self.db.conn.cursor() as cur:
+            cur.execute(f"ALTER TABLE documents DROP COLUMN IF EXISTS {SHADOW_COLUMN};")
+            self.db.conn.commit()
+        if migration:
+            self._set_status(migration, 'aborted')
+            logger.info(f"Aborted migration {migration['id']}")
+
+    def drop_previous(self):
+        """Drop the vectors kept from before the last swap"""
+        with self.db.conn.cursor() as cur:
+            cur.execute(f"ALTER TABLE documents DROP COLUMN IF EXISTS {PREVIOUS_COLUMN};")
+            self.db.conn.commit()
+        logger.info(f"Dropped {PREVIOUS_COLUMN}")
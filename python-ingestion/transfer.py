@@ -0,0 +1,204 @@
+from typing import Iterator, Optional, Tuple
+from config import config
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError("export/import need pyarrow: pip install pyarrow") from None
+    return pyarrow
+
+
+def detect_format(path: str, file_format: Optional[str] = None) -> str:
+    """Explicit format, else inferred from the extension (.arrow/.feather/.ipc are Arrow IPC)"""
+    if file_format:
+        return file_format
+    ext = os.path.splitext(path)[1].lower()
+    return 'arrow' if ext in ('.arrow', '.feather', '.ipc') else 'parquet'
+
+
+def store_embedding(db) -> Tuple[str, int]:
+    """
+    Model and dimension of the vectors the store holds
+
+    The model recorded by the last reembed swap, else EMBEDDING_MODEL; the
+    embedding column's dimension, else VECTOR_DIMENSION before setup.
+    """
+    active = db.embedding_model()
+    model = active[0] if active else config.EMBEDDING_MODEL
+    return model, db.embedding_dimension() or config.VECTOR_DIMENSION
+
+
+def documents_schema(dimension: int, model: str):
+    pa = _require_pyarrow()
+    return pa.schema([
+        ('content', pa.string()),
+        ('metadata', pa.string()),
+        ('content_type', pa.string()),
+        ('embedding', pa.list_(pa.float32(), dimension)),
+        ('created_at', pa.timestamp('us')),
+    ], metadata={
+        'embedding_model': model,
+        'vector_dimension': str(dimension),
+    })
+
+
+def _to_record_batch(rows, schema, dimension: int):
+    import numpy as np
+    pa = _require_pyarrow()
+
+    content, metadata, content_type, embedding, created_at = zip(*rows)
+    # pgvector >= 0.3 returns Vector objects, older versions numpy arrays
+    flat = np.concatenate([
+        e.to_numpy() if hasattr(e, 'to_numpy') else np.asarray(e, dtype=np.float32)
+        for e in embedding
+    ]).astype(np.float32, copy=False)
+    return pa.record_batch([
+        pa.array(content, pa.string()),
+        pa.array(metadata, pa.string()),
+        pa.array(content_type, pa.string()),
+        pa.FixedSizeListArray.from_arrays(pa.array(flat, pa.float32()), dimension),
+        pa.array(created_at, pa.timestamp('us')),
+    ], schema=schema)
+
+
+def export_documents(db, path: str, file_format: Optional[str] = None,
+                     batch_size: int = 10000) -> int:
+    """
+    Stream the documents table to a Parquet or Arrow IPC file
+
+    Embeddings are written as fixed-size float32 lists, metadata as JSON
+    text; the schema records the store's embedding model and dimension.
+    Returns the number of rows written.
+    """
+    pa = _require_pyarrow()
+    file_format = detect_format(path, file_format)
+    model, dimension = store_embedding(db)
+    schema = documents_schema(dimension, model)
+
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(path, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_file(path, schema)
+
+    total = 0
+    start = time.perf_counter()
+    try:
+        for rows in db.iter_documents(batch_size):
+            writer.write_batch(_to_record_batch(rows, schema, dimension))
+            total += len(rows)
+            logger.info(f"Exported {total} rows")
+    finally:
+        writer.close()
+
+    logger.info(f"Exported {total} rows to {path} ({file_format}) in {time.perf_counter() - start:.1f}s")
+    return total
+
+
+def _read_batches(path: str, file_format: str, batch_size: int) -> Iterator:
+    pa = _require_pyarrow()
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        yield parquet_file.schema_arrow
+        yield from parquet_file.iter_batches(batch_size=batch_size)
+    else:
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            yield reader.schema
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                for offset in range(0, batch.num_rows, batch_size):
+                    yield batch.slice(offset, batch_size)
+
+
+def import_documents(db, path: str, file_format: Optional[str] = None,
+                     batch_size: int = 10000, allow_model_mismatch: bool = False) -> int:
+    """
+    Bulk load an exported file into the documents table
+
+    The vector index is dropped for the load and rebuilt afterwards, and
+    the whole import is committed as one transaction. Returns the number of
+    rows imported.
+
+    The file's embedding model must match the store's. An empty store takes
+    the file's model, recorded in embedding_migrations as a reembed swap
+    would; otherwise a mismatch is refused unless allow_model_mismatch.
+    """
+    from database import model_key
+
+    import numpy as np
+    pa = _require_pyarrow()
+    file_format = detect_format(path, file_format)
+
+    batches = _read_batches(path, file_format, batch_size)
+    schema = next(batches)
+    dimension = schema.field('embedding').type.list_size
+    file_model = (schema.metadata or {}).get(b'embedding_model', b'').decode('utf-8')
+    store_model, store_dimension = store_embedding(db)
+    if dimension != store_dimension:
+        raise ValueError(f"{path} has {dimension}-dimensional embeddings, "
+                         f"but documents.embedding has {store_dimension} dimensions")
+
+    db.setup(with_vector_index=False)
+    record_model = False
+    if not file_model:
+        logger.warning(f"{path} does not record its embedding model; assuming {store_model}")
+    elif model_key(file_model) != model_key(store_model):
+        with db.conn.cursor() as cur:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM documents)")
+            has_rows = cur.fetchone()[0]
+        db.conn.commit()
+        if not has_rows:
+            logger.info(f"Empty store takes the file's embedding model {file_model}")
+            record_model = True
+        elif allow_model_mismatch:
+            logger.warning(f"Importing {file_model} embeddings into a store holding {store_model} "
+                           f"embeddings (--allow-model-mismatch)")
+        else:
+            raise ValueError(f"{path} holds {file_model} embeddings, but the store holds "
+                             f"{store_model} embeddings; pass --allow-model-mismatch to import anyway")
+
+    db.drop_vector_index()
+
+    total = 0
+    start = time.perf_counter()
+    try:
+        for batch in batches:
+            embeddings = batch.column('embedding').flatten().to_numpy(zero_copy_only=False)
+            created_at = batch.column('created_at').cast(pa.int64()).to_pylist()
+            total += db.copy_documents(
+                batch.column('content').to_pylist(),
+                batch.column('metadata').to_pylist(),
+                batch.column('content_type').to_pylist(),
+                np.asarray(embeddings, dtype=np.float32).reshape(-1, dimension),
+                created_at
+            )
+            logger.info(f"Imported {total} rows")
+        if record_model:
+            with db.conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO embedding_migrations (model, dimension, status, finished_at)
+                    VALUES (%s, %s, 'swapped', CURRENT_TIMESTAMP)
+                """, (file_model, dimension))
+        db.conn.commit()
+    except Exception:
+        db.conn.rollback()
+        raise
+    finally:
+        db.create_vector_index()
+
+    if db.reducer:
+        # COPY only loads full vectors; derive the reduced column for them too
+        from reduction import backfill
+        backfill(db, db.reducer)
+
+    logger.info(f"Imported {total} rows from {path} in {time.perf_counter() - start:.1f}s")
+    return total
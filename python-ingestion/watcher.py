@@ -0,0 +1,337 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHANGED = 'changed'
+DELETED = 'deleted'
+
+# Editor swap files and in-progress downloads/copies
+IGNORED_SUFFIXES = ('~', '.tmp', '.part', '.swp', '.swx', '.crdownload', '.partial')
+
+Event = Tuple[str, str]
+
+
+def is_ignored(path: str) -> bool:
+    name = os.path.basename(path)
+    return name.startswith('.') or name.endswith(IGNORED_SUFFIXES)
+
+
+class InotifyWatcher:
+    """Recursive directory watcher on Linux inotify, via ctypes"""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+
+    MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+            IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+
+    _HEADER = struct.Struct('iIII')
+
+    def __init__(self, root: str):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._dirs: Dict[int, str] = {}
+        # Files seen under the watched tree, to expand a removed directory into its files
+        self._files: Set[str] = set()
+        self._add_tree(root)
+        logger.info(f"Watching {len(self._dirs)} directories under {root} with inotify")
+
+    def _add_watch(self, path: str):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "inotify watch limit reached, raise fs.inotify.max_user_watches")
+            logger.warning(f"Cannot watch {path}: {os.strerror(err)}")
+            return
+        self._dirs[wd] = path
+
+    def _add_tree(self, root: str) -> List[str]:
+        """Watch root and its subdirectories, returning the files already in them"""
+        files = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            self._add_watch(dirpath)
+            files.extend(os.path.join(dirpath, name) for name in filenames)
+        self._files.update(files)
+        return files
+
+    def _remove_tree(self, root: str) -> List[str]:
+        """Drop the watches under a deleted or moved-away directory, returning its known files"""
+        prefix = os.path.join(root, '')
+        for wd, path in list(self._dirs.items()):
+            if path == root or path.startswith(prefix):
+                # A directory moved out of the tree keeps its watches, which would
+                # report events under the old paths
+                self._libc.inotify_rm_watch(self.fd, wd)
+                del self._dirs[wd]
+        files = [path for path in self._files if path.startswith(prefix)]
+        self._files.difference_update(files)
+        return files
+
+    def read(self, timeout: float) -> List[Event]:
+        """Wait up to timeout seconds and return (kind, path) events"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self._HEADER.unpack_from(data, offset)
+            offset += self._HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            if mask & self.IN_Q_OVERFLOW:
+                logger.warning("inotify queue overflowed, some changes were missed; "
+                               "run ingest-dir to catch up")
+                continue
+            if mask & self.IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    # Files can land in a new directory before its watch exists
+                    events.extend((CHANGED, f) for f in self._add_tree(path))
+                elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                    events.extend((DELETED, f) for f in self._remove_tree(path))
+                continue
+
+            if mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                self._files.discard(path)
+                events.append((DELETED, path))
+            elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_MODIFY | self.IN_CREATE):
+                self._files.add(path)
+                events.append((CHANGED, path))
+
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback watcher that diffs (mtime, size) snapshots of the tree"""
+
+    def __init__(self, root: str, interval: float = 5.0):
+        self.root = root
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._next_poll = time.monotonic() + interval
+        logger.info(f"Polling {len(self._snapshot)} files under {root} every {interval}s")
+
+    def _scan(self) -> Dict[str, Tuple[float, int]]:
+        snapshot = {}
+        stack = [self.root]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file():
+                            stat = entry.stat()
+                            snapshot[entry.path] = (stat.st_mtime, stat.st_size)
+                    except OSError:
+                        continue
+        return snapshot
+
+    def read(self, timeout: float) -> List[Event]:
+        wait = self._next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        if wait > 0:
+            time.sleep(wait)
+        self._next_poll = time.monotonic() + self.interval
+
+        snapshot = self._scan()
+        events = [(CHANGED, path) for path, state in snapshot.items()
+                  if self._snapshot.get(path) != state]
+        events += [(DELETED, path) for path in self._snapshot if path not in snapshot]
+        self._snapshot = snapshot
+        return events
+
+    def close(self):
+        pass
+
+
+def create_watcher(root: str, poll_interval: float = 5.0, force_polling: bool = False):
+    """inotify on Linux, polling everywhere else or if inotify is unavailable"""
+    if not force_polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify unavailable ({e}), falling back to polling")
+    return PollingWatcher(root, poll_interval)
+
+
+class EventBatcher:
+    """
+    Debounces and coalesces file events into batches
+
+    A path is ready once it has seen no events for `debounce` seconds, so
+    files still being written are held back. Only the latest event per path
+    is kept. Ready paths are released when `batch_size` of them are waiting
+    or `batch_window` seconds have passed since the previous batch.
+
+    Events that failed to process are retried with exponential backoff, up
+    to `max_retries` times; a new event for the path starts over.
+    """
+
+    def __init__(self, debounce: float = 2.0, batch_size: int = 50, batch_window: float = 5.0,
+                 retry_delay: float = 10.0, max_retry_delay: float = 300.0, max_retries: int = 5):
+        self.debounce = debounce
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_retries = max_retries
+        # path -> (kind, time it becomes ready)
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        self._attempts: Dict[str, int] = {}
+        self._last_batch = time.monotonic()
+
+    def add(self, kind: str, path: str, now: Optional[float] = None):
+        now = now if now is not None else time.monotonic()
+        self._pending[path] = (kind, now + self.debounce)
+        self._attempts.pop(path, None)
+
+    def retry(self, kind: str, path: str, now: Optional[float] = None) -> bool:
+        """Requeue a failed event after a backoff, False once it has run out of retries"""
+        if path in self._pending:
+            # A newer event already superseded this one
+            return True
+        attempts = self._attempts.get(path, 0) + 1
+        if attempts > self.max_retries:
+            self._attempts.pop(path, None)
+            return False
+        self._attempts[path] = attempts
+        now = now if now is not None else time.monotonic()
+        delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+        self._pending[path] = (kind, now + delay)
+        return True
+
+    def done(self, path: str):
+        """Forget the retry count of a successfully processed path"""
+        self._attempts.pop(path, None)
+
+    def pop_batch(self, now: Optional[float] = None) -> List[Event]:
+        now = now if now is not None else time.monotonic()
+        ready = sorted(
+            (ready_at, path, kind) for path, (kind, ready_at) in self._pending.items()
+            if ready_at <= now
+        )
+        if not ready:
+            return []
+        if len(ready) < self.batch_size and now - self._last_batch < self.batch_window:
+            return []
+
+        batch = ready[:self.batch_size]
+        for _, path, _ in batch:
+            del self._pending[path]
+        self._last_batch = now
+        return [(kind, path) for _, path, kind in batch]
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+
+def process_batch(ingestion, batch: List[Event]) -> List[Event]:
+    """
+    Apply a batch of changes: remove deleted files' rows, re-ingest changed ones
+
+    A changed file's old rows are replaced only after its new version is
+    stored, so a failure leaves the previous version in place. Returns the
+    events that failed.
+    """
+    try:
+        ingestion.db.ensure_connected()
+    except Exception as e:
+        logger.error(f"Database unavailable, deferring batch: {e}")
+        return list(batch)
+    ingested = removed = 0
+    failed = []
+
+    for kind, path in batch:
+        try:
+            if kind == DELETED or not os.path.isfile(path):
+                removed += ingestion.remove_file(path)
+            elif ingestion.replace_file(path):
+                ingested += 1
+        except Exception as e:
+            failed.append((kind, path))
+            logger.error(f"Failed to process {kind} {path}: {e}")
+
+    logger.info(f"Batch done: {ingested} files ingested, {removed} rows removed, {len(failed)} failed")
+    return failed
+
+
+def watch(ingestion, root: str, debounce: float = 2.0, batch_size: int = 50,
+          batch_window: float = 5.0, poll_interval: float = 5.0, force_polling: bool = False):
+    """
+    Ingest new and changed files under root as they appear, until interrupted
+
+    The same ingestion instance, and so the same Ollama clients and database
+    connection, is reused for every batch.
+    """
+    watcher = create_watcher(root, poll_interval, force_polling)
+    batcher = EventBatcher(debounce, batch_size, batch_window)
+
+    try:
+        while True:
+            for kind, path in watcher.read(timeout=min(debounce, 1.0)):
+                if not is_ignored(path) and ingestion.is_supported(path):
+                    batcher.add(kind, path)
+
+            batch = batcher.pop_batch()
+            if batch:
+                logger.info(f"Processing batch of {len(batch)} changes ({len(batcher)} pending)")
+                failed = process_batch(ingestion, batch)
+                for kind, path in batch:
+                    if (kind, path) not in failed:
+                        batcher.done(path)
+                for kind, path in failed:
+                    if not batcher.retry(kind, path):
+                        logger.error(f"Giving up on {kind} {path} after {batcher.max_retries} retries; "
+                                     f"it is retried when it changes again")
+    except KeyboardInterrupt:
+        logger.info("Stopping watch")
+    finally:
+        watcher.close()